@@ -0,0 +1,77 @@
+"""Time per-student attendance analytics over a synthetic academic year: loading the matrix and analysing it.
+
+Seeds one staff member's classes with a record per school day, then times
+AttendanceAnalyticsService.load_matrix (query plus matrix build) and analyze
+separately. Run against a real MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.benchmarks.bench_attendance_analytics --classes 60 --students 30 --days 190
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from ..database import mongo, attendance_records_collection, class_rosters_collection
+from ..ids import new_id
+from ..services.attendance_analytics import AttendanceAnalyticsService
+from ..services.roster_service import RosterService, totals_from_statuses
+from ..services.dates import to_stored_date
+
+BENCH_STAFF_ID = "bench-attendance-analytics"
+
+def _school_days(count: int):
+    day = date(2024, 9, 2)
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += timedelta(days=1)
+
+async def _seed(classes: int, students: int, days: int):
+    rng = np.random.default_rng(7)
+    dates = list(_school_days(days))
+    for class_number in range(classes):
+        class_name = f"Bench Class {class_number}"
+        roster = await RosterService.resolve(BENCH_STAFF_ID, class_name, [{"name": f"Student {n}"} for n in range(students)])
+        # Mostly present, some absent, a few late
+        codes = rng.choice(3, size=(days, students), p=[0.88, 0.08, 0.04]).tolist()
+        now = datetime.utcnow()
+        await attendance_records_collection.insert_many([
+            {"id": new_id(), "class_name": class_name, "date": to_stored_date(day), "staff_id": BENCH_STAFF_ID,
+             "roster_id": roster["id"], "statuses": statuses, **totals_from_statuses(statuses),
+             "created_at": now, "updated_at": now}
+            for day, statuses in zip(dates, codes)
+        ])
+
+async def main(classes: int, students: int, days: int, iterations: int):
+    await mongo.connect()
+    try:
+        await _seed(classes, students, days)
+        load_ms, analyze_ms = [], []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            matrix = await AttendanceAnalyticsService.load_matrix(staff_id=BENCH_STAFF_ID)
+            loaded = time.perf_counter()
+            result = AttendanceAnalyticsService.analyze(matrix, below_rate=85)
+            load_ms.append((loaded - started) * 1000)
+            analyze_ms.append((time.perf_counter() - loaded) * 1000)
+        print(f"{matrix.records} records, {result['total_students']} students x {result['dates']} dates, "
+              f"{len(result['students'])} below 85%, {result['chronic_absence_count']} chronically absent")
+        print(f"load    mean={statistics.mean(load_ms):.2f}ms p50={statistics.median(load_ms):.2f}ms")
+        print(f"analyze mean={statistics.mean(analyze_ms):.2f}ms p50={statistics.median(analyze_ms):.2f}ms")
+    finally:
+        await attendance_records_collection.delete_many({"staff_id": BENCH_STAFF_ID})
+        await class_rosters_collection.delete_many({"staff_id": BENCH_STAFF_ID})
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", type=int, default=60)
+    parser.add_argument("--students", type=int, default=30, help="students per class")
+    parser.add_argument("--days", type=int, default=190, help="school days in the year")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.classes, args.students, args.days, args.iterations))
@@ -0,0 +1,76 @@
+"""Per-create latency: insert-then-re-read versus the repository's single insert.
+
+Run against a real MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.benchmarks.bench_create_latency --iterations 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+from ..database import mongo, db
+from ..models import Schedule
+from ..services.repository import Repository
+
+BENCH_COLLECTION = "bench_create_latency"
+
+def _schedule_document(i: int) -> dict:
+    return {
+        "id": f"bench-{i}",
+        "time": "09:00",
+        "subject": "Mathematics",
+        "class": "Grade 10A",
+        "room": "Room 101",
+        "day": "Monday",
+        "status": "scheduled",
+        "staff_id": "bench-staff",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+
+async def _create_with_reread(collection, i: int) -> Schedule:
+    result = await collection.insert_one(_schedule_document(i))
+    created = await collection.find_one({"_id": result.inserted_id})
+    created.pop("_id", None)
+    return Schedule(**created)
+
+async def _create_with_repository(repository: Repository, i: int) -> Schedule:
+    return await repository.insert(_schedule_document(i))
+
+def _summary(name: str, samples_ms: list) -> str:
+    samples_ms = sorted(samples_ms)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    p99 = samples_ms[int(len(samples_ms) * 0.99) - 1]
+    return (f"{name:<12} mean={statistics.mean(samples_ms):.3f}ms "
+            f"p50={statistics.median(samples_ms):.3f}ms p95={p95:.3f}ms p99={p99:.3f}ms")
+
+async def main(iterations: int):
+    await mongo.connect()
+    collection = db[BENCH_COLLECTION]
+    repository = Repository(collection, Schedule)
+    try:
+        await collection.drop()
+        results = {}
+        for name, create in (("re-read", lambda i: _create_with_reread(collection, i)),
+                             ("repository", lambda i: _create_with_repository(repository, i))):
+            await collection.delete_many({})
+            samples = []
+            for i in range(iterations):
+                started = time.perf_counter()
+                await create(i)
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = samples
+            print(_summary(name, samples))
+        before = statistics.mean(results["re-read"])
+        after = statistics.mean(results["repository"])
+        print(f"mean per-create latency reduced by {(1 - after / before) * 100:.1f}%")
+    finally:
+        await collection.drop()
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,106 @@
+"""CPU per request on the attendance and schedule list endpoints: validated models versus the trusted-read path.
+
+The validated path is what the routes did before: build models in the service,
+then let FastAPI validate and serialize them against the response_model and
+encode with the standard JSON encoder. The trusted path maps raw documents to
+their response shape and encodes them with orjson. Both bodies are checked to
+decode to the same JSON before timing.
+
+Run against a real MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.benchmarks.bench_trusted_reads --iterations 500 --records 50 --students 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from ..database import mongo, attendance_records_collection, class_rosters_collection, schedules_collection
+from ..ids import new_id
+from ..models import AttendanceRecordCreate, AttendanceRecordView, Page, Schedule, StudentCreate
+from ..routes.trusted import trusted_response
+from ..services.attendance_service import AttendanceService
+from ..services.roster_service import RosterService
+from ..services.schedule_service import ScheduleService
+
+BENCH_STAFF_ID = "bench-trusted-reads"
+
+async def _attendance_document(i: int, students: int) -> dict:
+    record = AttendanceRecordCreate(
+        class_name=f"Grade {i % 12 + 1}A",
+        date=f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        students=[StudentCreate(name=f"Student {n}") for n in range(students)],
+        staff_id=BENCH_STAFF_ID
+    )
+    return await RosterService.compact(AttendanceService.build_document(record))
+
+def _schedule_document(i: int) -> dict:
+    return {
+        "id": new_id(),
+        "time": f"{8 + i % 9:02d}:00",
+        "subject": "Mathematics",
+        "class": "Grade 10A",
+        "room": "Room 101",
+        "day": "Monday",
+        "status": "scheduled",
+        "staff_id": BENCH_STAFF_ID,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+
+async def _validated_body(fetch, field, exclude_unset: bool) -> bytes:
+    content = await serialize_response(field=field, response_content=await fetch(False), exclude_unset=exclude_unset)
+    return JSONResponse(content).body
+
+async def _trusted_body(fetch) -> bytes:
+    return trusted_response(await fetch(True)).body
+
+async def _measure(render, iterations: int) -> List[float]:
+    """CPU milliseconds per request (process time, so waiting on MongoDB is not counted)"""
+    samples = []
+    for _ in range(iterations):
+        started = time.process_time()
+        await render()
+        samples.append((time.process_time() - started) * 1000)
+    return samples
+
+async def main(iterations: int, records: int, students: int):
+    await mongo.connect()
+    try:
+        await attendance_records_collection.insert_many([await _attendance_document(i, students) for i in range(records)])
+        await schedules_collection.insert_many([_schedule_document(i) for i in range(records)])
+        endpoints = (
+            ("attendance list", lambda trusted: AttendanceService.get_attendance_records_by_staff(BENCH_STAFF_ID, records, trusted=trusted),
+             create_response_field("bench", Page[AttendanceRecordView]), True),
+            ("schedule list", lambda trusted: ScheduleService.get_schedules_by_staff(BENCH_STAFF_ID, records, trusted=trusted),
+             create_response_field("bench", Page[Schedule]), False),
+        )
+        for name, fetch, field, exclude_unset in endpoints:
+            validated = lambda: _validated_body(fetch, field, exclude_unset)
+            trusted = lambda: _trusted_body(fetch)
+            if json.loads(await validated()) != json.loads(await trusted()):
+                raise SystemExit(f"{name}: trusted body differs from the validated body")
+            before = statistics.mean(await _measure(validated, iterations))
+            after = statistics.mean(await _measure(trusted, iterations))
+            print(f"{name:<16} validated={before:.3f}ms trusted={after:.3f}ms "
+                  f"cpu per request reduced by {(1 - after / before) * 100:.1f}%")
+    finally:
+        await attendance_records_collection.delete_many({"staff_id": BENCH_STAFF_ID})
+        await schedules_collection.delete_many({"staff_id": BENCH_STAFF_ID})
+        await class_rosters_collection.delete_many({"staff_id": BENCH_STAFF_ID})
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--records", type=int, default=50, help="records per list page")
+    parser.add_argument("--students", type=int, default=30, help="students per attendance record")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.records, args.students))
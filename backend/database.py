@@ -1,28 +1,434 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional
+from datetime import datetime
 import os
+import time
+import logging
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """Connection and pool configuration, read from the environment"""
+    url: str
+    db_name: str = "staff_utility_app"
+    app_name: str = "staff-utility-api"
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    compressors: List[str] = field(default_factory=list)
+    zlib_compression_level: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        compressors = os.environ.get("MONGO_COMPRESSORS", "")
+        return cls(
+            url=os.environ['MONGO_URL'],
+            db_name=os.environ.get('DB_NAME', 'staff_utility_app'),
+            app_name=os.environ.get('MONGO_APP_NAME', 'staff-utility-api'),
+            max_pool_size=_env_int('MONGO_MAX_POOL_SIZE', 100),
+            min_pool_size=_env_int('MONGO_MIN_POOL_SIZE', 0),
+            max_idle_time_ms=_env_int('MONGO_MAX_IDLE_TIME_MS'),
+            wait_queue_timeout_ms=_env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+            compressors=[c.strip() for c in compressors.split(",") if c.strip()],
+            zlib_compression_level=_env_int('MONGO_ZLIB_COMPRESSION_LEVEL'),
+        )
+
+    def client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for the Motor client; unset options keep the driver defaults"""
+        options: Dict[str, Any] = {
+            "appname": self.app_name,
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+        }
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        if self.zlib_compression_level is not None:
+            options["zlibCompressionLevel"] = self.zlib_compression_level
+        return options
+
+class PoolCheckoutMetrics(ConnectionPoolListener):
+    """Records how long operations wait to check a connection out of the pool"""
+
+    # Upper bounds (ms) of the wait-time histogram buckets
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.failures = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.checked_out = 0
+            self.open_connections = 0
+            self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def _elapsed_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        # Motor runs each pymongo call on an executor thread, so start and end share a thread
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._elapsed_ms()
+        bucket = next((i for i, bound in enumerate(self.BUCKETS_MS) if wait_ms <= bound), len(self.BUCKETS_MS))
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.histogram[bucket] += 1
+
+    def connection_check_out_failed(self, event):
+        self._elapsed_ms()
+        with self._lock:
+            self.failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "wait_histogram": dict(zip(labels, self.histogram)),
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+            }
+
+class MongoConnectionManager:
+    """Owns the single Motor client shared by every service module.
+
+    The client is built with connect=False, so no sockets are opened until the
+    app lifespan calls connect(); close() is called from the same lifespan.
+    """
+
+    def __init__(self, settings: MongoSettings):
+        self.settings = settings
+        self.pool_metrics = PoolCheckoutMetrics()
+        self.client = AsyncIOMotorClient(
+            settings.url,
+            connect=False,
+            event_listeners=[self.pool_metrics],
+            **settings.client_options()
+        )
+        self.db = self.client[settings.db_name]
+
+    async def connect(self):
+        """Open the pool and verify the server is reachable"""
+        await self.db.command("ping")
+
+    def close(self):
+        self.client.close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            "app_name": self.settings.app_name,
+            "max_pool_size": self.settings.max_pool_size,
+            "min_pool_size": self.settings.min_pool_size,
+            "max_idle_time_ms": self.settings.max_idle_time_ms,
+            "wait_queue_timeout_ms": self.settings.wait_queue_timeout_ms,
+            "compressors": self.settings.compressors,
+            **self.pool_metrics.snapshot(),
+        }
+
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'staff_utility_app')]
+mongo = MongoConnectionManager(MongoSettings.from_env())
+client = mongo.client
+db = mongo.db
 
 # Collections
 staff_profiles_collection = db.staff_profiles
 schedules_collection = db.schedules
 attendance_records_collection = db.attendance_records
+class_rosters_collection = db.class_rosters
+attendance_rollups_collection = db.attendance_rollups
 templates_collection = db.templates
 form_submissions_collection = db.form_submissions
 voice_transcriptions_collection = db.voice_transcriptions
 voice_to_template_conversions_collection = db.voice_to_template_conversions
 tasks_collection = db.tasks
-activities_collection = db.activities
+activities_collection = db.activities  # legacy one-document-per-activity store, see activity_store
+activity_buckets_collection = db.activity_buckets
+activity_rollups_collection = db.activity_rollups
 announcements_collection = db.announcements
+staff_stats_collection = db.staff_stats
+collection_versions_collection = db.collection_versions
+job_locks_collection = db.job_locks
+
+# Index registry: every index the services rely on, keyed by collection name.
+# Compound indexes lead with the equality fields of a query and end with its sort key.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "staff_profiles": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "schedules": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("day", ASCENDING), ("time", ASCENDING)], name="staff_day_time"),
+        IndexModel([("staff_id", ASCENDING), ("id", ASCENDING)], name="staff_id_id"),
+        IndexModel([("staff_id", ASCENDING), ("status", ASCENDING)], name="staff_status"),
+    ],
+    "attendance_records": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="staff_date_id"),
+        # Covers get_attendance_stats: the filter keys plus every summed total
+        IndexModel([("staff_id", ASCENDING), ("date", ASCENDING), ("class_name", ASCENDING),
+                    ("total_students", ASCENDING), ("present", ASCENDING), ("absent", ASCENDING), ("late", ASCENDING)],
+                   name="staff_date_totals"),
+        # Class and date-only exports sort on these; the class one also serves class analytics
+        IndexModel([("class_name", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], name="class_date_id"),
+        IndexModel([("date", ASCENDING), ("id", ASCENDING)], name="date_id"),
+    ],
+    "attendance_rollups": [
+        IndexModel([("scope", ASCENDING), ("key", ASCENDING), ("granularity", ASCENDING), ("period", ASCENDING)],
+                   name="scope_key_granularity_period_unique", unique=True),
+    ],
+    "class_rosters": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("class_name", ASCENDING), ("version", DESCENDING)], name="staff_class_version_unique", unique=True),
+        IndexModel([("students.id", ASCENDING)], name="student_id"),
+    ],
+    "templates": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING)], name="category"),
+    ],
+    "form_submissions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+        # Template and date-only exports sort on these
+        IndexModel([("template_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="template_created_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_id"),
+    ],
+    "voice_transcriptions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+    ],
+    "voice_to_template_conversions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+    ],
+    "tasks": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("due_date", ASCENDING), ("id", ASCENDING)], name="staff_due_date_id"),
+        IndexModel([("staff_id", ASCENDING), ("completed", ASCENDING), ("due_date", ASCENDING)], name="staff_completed_due_date"),
+    ],
+    "activities": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+    ],
+    "activity_buckets": [
+        # Serves both the append upsert (staff_id, day) and the newest-first feed
+        IndexModel([("staff_id", ASCENDING), ("day", DESCENDING), ("started_at", DESCENDING)], name="staff_day_started"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "activity_rollups": [
+        IndexModel([("staff_id", ASCENDING), ("day", ASCENDING), ("type", ASCENDING)], name="staff_day_type_unique", unique=True),
+    ],
+    "announcements": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created"),
+    ],
+    "staff_stats": [
+        IndexModel([("staff_id", ASCENDING)], name="staff_id_unique", unique=True),
+    ],
+    "collection_versions": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    "job_locks": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+}
+
+# Indexes replaced by a registered one (the keyset-pagination and export indexes gained a trailing id);
+# dropped on startup so inserts stop maintaining them
+SUPERSEDED_INDEXES: Dict[str, List[str]] = {
+    "attendance_records": ["staff_date", "class_date"],
+    "form_submissions": ["staff_created"],
+    "voice_transcriptions": ["staff_created"],
+    "voice_to_template_conversions": ["staff_created"],
+    "tasks": ["staff_due_date"],
+    "activities": ["staff_created"],
+}
+
+class QueryShape(NamedTuple):
+    """A query issued by a service, checked against the index registry at startup"""
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[tuple]] = None
+
+# Placeholder values are fine here: the planner picks an index from the query shape
+_SAMPLE = "__explain__"
+
+QUERY_SHAPES: Dict[str, QueryShape] = {
+    "staff.by_id": QueryShape("staff_profiles", {"id": _SAMPLE}),
+    "staff.by_email": QueryShape("staff_profiles", {"email": _SAMPLE}),
+    "schedule.by_id": QueryShape("schedules", {"id": _SAMPLE}),
+    "schedule.by_staff": QueryShape("schedules", {"staff_id": _SAMPLE}, [("id", ASCENDING)]),
+    "schedule.by_day": QueryShape("schedules", {"staff_id": _SAMPLE, "day": _SAMPLE}, [("time", ASCENDING)]),
+    "attendance.by_id": QueryShape("attendance_records", {"id": _SAMPLE}),
+    "attendance.by_staff": QueryShape("attendance_records", {"staff_id": _SAMPLE}, [("date", DESCENDING), ("id", DESCENDING)]),
+    "attendance.by_date": QueryShape("attendance_records", {"staff_id": _SAMPLE, "date": _SAMPLE}),
+    "attendance.by_staff_date_range": QueryShape("attendance_records", {"staff_id": _SAMPLE, "date": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("date", DESCENDING), ("id", DESCENDING)]),
+    "attendance.stats": QueryShape("attendance_records", {"staff_id": _SAMPLE, "date": {"$gte": _SAMPLE, "$lte": _SAMPLE}, "class_name": _SAMPLE}),
+    "attendance.analytics_by_class": QueryShape("attendance_records", {"class_name": _SAMPLE, "date": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("date", ASCENDING)]),
+    "attendance.by_class": QueryShape("attendance_records", {"class_name": _SAMPLE}),
+    "attendance.export_by_staff": QueryShape("attendance_records", {"staff_id": _SAMPLE}, [("date", ASCENDING), ("id", ASCENDING)]),
+    "attendance.export_by_class": QueryShape("attendance_records", {"class_name": _SAMPLE, "date": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("date", ASCENDING), ("id", ASCENDING)]),
+    "attendance.export_by_date": QueryShape("attendance_records", {"date": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("date", ASCENDING), ("id", ASCENDING)]),
+    "attendance_rollup.by_key": QueryShape("attendance_rollups", {"scope": _SAMPLE, "key": _SAMPLE}),
+    "attendance_rollup.trend": QueryShape("attendance_rollups", {"scope": _SAMPLE, "key": _SAMPLE, "granularity": _SAMPLE, "period": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("period", ASCENDING)]),
+    "roster.by_id": QueryShape("class_rosters", {"id": _SAMPLE}),
+    "roster.latest": QueryShape("class_rosters", {"staff_id": _SAMPLE, "class_name": _SAMPLE}, [("version", DESCENDING)]),
+    "roster.by_student": QueryShape("class_rosters", {"students.id": _SAMPLE}),
+    "template.by_id": QueryShape("templates", {"id": _SAMPLE}),
+    "template.by_category": QueryShape("templates", {"category": _SAMPLE}),
+    "submission.by_id": QueryShape("form_submissions", {"id": _SAMPLE}),
+    "submission.by_staff": QueryShape("form_submissions", {"staff_id": _SAMPLE}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    "submission.export_by_staff": QueryShape("form_submissions", {"staff_id": _SAMPLE}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    "submission.export_by_template": QueryShape("form_submissions", {"template_id": _SAMPLE, "created_at": {"$gte": _SAMPLE, "$lt": _SAMPLE}}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    "submission.export_by_date": QueryShape("form_submissions", {"created_at": {"$gte": _SAMPLE, "$lt": _SAMPLE}}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    "transcription.by_id": QueryShape("voice_transcriptions", {"id": _SAMPLE}),
+    "transcription.by_staff": QueryShape("voice_transcriptions", {"staff_id": _SAMPLE}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    "conversion.by_id": QueryShape("voice_to_template_conversions", {"id": _SAMPLE}),
+    "conversion.by_staff": QueryShape("voice_to_template_conversions", {"staff_id": _SAMPLE}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    "task.by_id": QueryShape("tasks", {"id": _SAMPLE}),
+    "task.by_staff": QueryShape("tasks", {"staff_id": _SAMPLE}, [("due_date", ASCENDING), ("id", ASCENDING)]),
+    "task.by_staff_due_range": QueryShape("tasks", {"staff_id": _SAMPLE, "due_date": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("due_date", ASCENDING), ("id", ASCENDING)]),
+    "task.upcoming": QueryShape("tasks", {"staff_id": _SAMPLE, "completed": False, "due_date": {"$gte": _SAMPLE}}, [("due_date", ASCENDING)]),
+    "activity.recent": QueryShape("activity_buckets", {"staff_id": _SAMPLE}, [("day", DESCENDING), ("started_at", DESCENDING)]),
+    "activity.open_bucket": QueryShape("activity_buckets", {"staff_id": _SAMPLE, "day": _SAMPLE, "count": {"$lte": 0}}),
+    "activity.rollups": QueryShape("activity_rollups", {"staff_id": _SAMPLE, "day": {"$gte": _SAMPLE, "$lte": _SAMPLE}}, [("day", ASCENDING)]),
+    "announcement.recent": QueryShape("announcements", {}, [("created_at", DESCENDING)]),
+    "staff_stats.by_staff": QueryShape("staff_stats", {"staff_id": _SAMPLE}),
+    "collection_version.by_key": QueryShape("collection_versions", {"key": _SAMPLE}),
+    "job_lock.by_name": QueryShape("job_locks", {"name": _SAMPLE}),
+}
+
+DUPLICATE_KEY_ERROR = 11000
+# Duplicate values listed when a unique index cannot be built
+MAX_REPORTED_DUPLICATES = 20
+
+async def _duplicate_values(collection, keys: List[str]) -> List[Any]:
+    """Values of `keys` held by more than one document"""
+    group_id = f"${keys[0]}" if len(keys) == 1 else {key.replace(".", "_"): f"${key}" for key in keys}
+    pipeline = [
+        {"$group": {"_id": group_id, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": MAX_REPORTED_DUPLICATES}
+    ]
+    return [row["_id"] async for row in collection.aggregate(pipeline)]
+
+async def ensure_indexes():
+    """Create every registered index and drop superseded ones; create_indexes is a no-op for indexes that already exist.
+
+    An index that cannot be built is logged and skipped so the app still
+    starts. Usually that is a unique index over duplicates left by older data
+    (such as the timestamp ids issued before ids.new_id); the duplicate values
+    are logged so they can be fixed, after which the next start builds it.
+    """
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        created = []
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                created += await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code == DUPLICATE_KEY_ERROR and index.document.get("unique"):
+                    duplicates = await _duplicate_values(collection, list(index.document["key"]))
+                    logger.error(f"Unique index {name} on {collection_name} not built, duplicate values: {duplicates}")
+                else:
+                    logger.error(f"Index {name} on {collection_name} not built: {e}")
+        logger.info(f"Indexes ensured on {collection_name}: {', '.join(created)}")
+    for collection_name, names in SUPERSEDED_INDEXES.items():
+        existing = await db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection_name].drop_index(name)
+                logger.info(f"Dropped superseded index {name} on {collection_name}")
+
+def _has_collscan(plan: Any) -> bool:
+    """Walk an explain plan tree looking for a COLLSCAN stage"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+async def verify_query_plans() -> List[str]:
+    """Explain each registered query shape and warn about any that still scans its collection"""
+    collscans = []
+    for shape_name, shape in QUERY_SHAPES.items():
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        plan = await cursor.explain()
+        if _has_collscan(plan.get("queryPlanner", {}).get("winningPlan")):
+            collscans.append(shape_name)
+            logger.warning(f"Query '{shape_name}' on {shape.collection} uses a COLLSCAN: {shape.filter}")
+    return collscans
 
 async def init_database():
-    """Initialize database with default data"""
+    """Initialize database with indexes and default data"""
+    
+    await mongo.connect()
+    await ensure_indexes()
     
     # Initialize default templates if none exist
     template_count = await templates_collection.count_documents({})
@@ -76,6 +482,12 @@ async def init_database():
         ]
         
         await templates_collection.insert_many(default_templates)
+        # Same bump as CollectionVersions.bump, so cached template lists are revalidated
+        await collection_versions_collection.update_one(
+            {"key": "templates"},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
         print("✅ Default templates inserted")
     
     # Initialize default announcements if none exist
@@ -98,7 +510,10 @@ async def init_database():
         
         await announcements_collection.insert_many(default_announcements)
         print("✅ Default announcements inserted")
+    
+    # Startup self-check: every service query should be served by an index
+    await verify_query_plans()
 
 async def close_database():
     """Close database connection"""
-    client.close()
\ No newline at end of file
+    mongo.close()
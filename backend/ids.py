@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Crockford base32: no I, L, O or U, so ids stay unambiguous and sort as plain strings
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(_ALPHABET)}
+
+ID_LENGTH = 26
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+class IdGenerator:
+    """ULID-style ids: 48-bit millisecond timestamp followed by 80 random bits.
+
+    Ids are 26 characters, sort lexically in creation order and are strictly
+    increasing within a process (the random part is incremented when several
+    ids share a millisecond). The random part keeps ids from different workers
+    apart, and is reseeded in forked children so they never share a sequence.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new_id(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            elif self._last_random < _RANDOM_MAX:
+                # Same millisecond (or the clock stepped back): stay monotonic
+                self._last_random += 1
+            else:
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            value = (self._last_ms << _RANDOM_BITS) | self._last_random
+        return encode(value)
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def id_timestamp(id: str) -> datetime:
+    """Creation time encoded in an id produced by new_id()"""
+    value = 0
+    for char in id[:10]:
+        value = (value << 5) | _DECODE[char]
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+_generator = IdGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_generator._reset)
+
+def new_id() -> str:
+    """Return a new fixed-width, time-ordered, collision-resistant id"""
+    return _generator.new_id()
@@ -0,0 +1,42 @@
+"""Move activities from the legacy one-document-per-activity collection into day buckets.
+
+Events older than the retention window still count towards the daily rollups;
+their buckets are created already expired and the TTL index removes them.
+Run once against the configured MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.jobs.migrate_activity_buckets [--batch-size 1000] [--drop-legacy]
+"""
+import argparse
+import asyncio
+
+from ..database import mongo, activities_collection
+from ..services.activity_store import ActivityStore
+
+async def main(batch_size: int, drop_legacy: bool):
+    await mongo.connect()
+    try:
+        migrated = 0
+        batch = []
+        cursor = activities_collection.find({}, {"_id": 0}).sort([("created_at", 1), ("id", 1)]).batch_size(batch_size)
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) == batch_size:
+                await ActivityStore.append(batch)
+                migrated += len(batch)
+                batch = []
+        if batch:
+            await ActivityStore.append(batch)
+            migrated += len(batch)
+        print(f"migrated {migrated} activities into buckets")
+        if drop_legacy:
+            await activities_collection.drop()
+            print("dropped the legacy activities collection")
+    finally:
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.drop_legacy))
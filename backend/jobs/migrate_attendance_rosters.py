@@ -0,0 +1,65 @@
+"""Move attendance records from embedded student lists to class rosters plus packed statuses.
+
+Records are processed per class in date order, so each class's roster
+versions follow its history. Student ids become the roster's ids: a student
+keeps the id from the first record of the class they appear in, and later
+records reuse it by name. A record changed while the job runs is skipped and
+picked up by the next run. Run against the configured MongoDB (uses
+MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.jobs.migrate_attendance_rosters [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+
+from bson import encode
+from pymongo import UpdateOne
+
+from ..database import mongo, attendance_records_collection
+from ..services.roster_service import RosterService
+
+LEGACY_FILTER = {"students": {"$exists": True}, "statuses": {"$exists": False}}
+
+async def main(batch_size: int, dry_run: bool):
+    await mongo.connect()
+    try:
+        migrated = skipped = bytes_before = bytes_after = 0
+        operations = []
+
+        async def flush():
+            nonlocal migrated, skipped
+            if operations and not dry_run:
+                result = await attendance_records_collection.bulk_write(operations, ordered=False)
+                migrated += result.modified_count
+                skipped += len(operations) - result.modified_count
+            elif operations:
+                migrated += len(operations)
+            operations.clear()
+
+        cursor = attendance_records_collection.find(LEGACY_FILTER).sort(
+            [("staff_id", 1), ("class_name", 1), ("date", 1), ("id", 1)]
+        ).batch_size(batch_size)
+        async for document in cursor:
+            compacted = await RosterService.compact(document)
+            bytes_before += len(encode(document))
+            bytes_after += len(encode(compacted))
+            operations.append(UpdateOne(
+                {"id": document["id"], "updated_at": document["updated_at"], **LEGACY_FILTER},
+                {"$set": {"roster_id": compacted["roster_id"], "statuses": compacted["statuses"]}, "$unset": {"students": ""}}
+            ))
+            if len(operations) >= batch_size:
+                await flush()
+        await flush()
+        verb = "would migrate" if dry_run else "migrated"
+        print(f"{verb} {migrated} attendance records, skipped {skipped} changed during the run")
+        if bytes_after:
+            print(f"record bytes {bytes_before} -> {bytes_after} ({bytes_before / bytes_after:.1f}x smaller, rosters not counted)")
+    finally:
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without rewriting records (rosters are still created)")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
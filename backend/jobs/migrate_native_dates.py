@@ -0,0 +1,40 @@
+"""Convert attendance dates and task due dates stored as strings to native dates.
+
+The app runs this conversion on startup before serving; use this job to
+preview it or to re-run it. Values that are not dates in any format
+parse_date reads are left as they are and listed. A document changed while
+the job runs is skipped and picked up by the next run. Run against the
+configured MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.jobs.migrate_native_dates [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from ..database import mongo
+from ..services.date_migration import NativeDateMigration, MIGRATION_BATCH_SIZE, MAX_REPORTED_INVALID
+from ..services.job_locks import JobLockedError
+
+async def main(batch_size: int, dry_run: bool):
+    await mongo.connect()
+    try:
+        results = await NativeDateMigration.migrate(batch_size, dry_run)
+    except JobLockedError as e:
+        sys.exit(str(e))
+    finally:
+        mongo.close()
+
+    verb = "would convert" if dry_run else "converted"
+    for result in results:
+        print(f"{result['collection']}.{result['field']}: {verb} {result['converted']}, "
+              f"skipped {result['skipped']} changed during the run, {len(result['invalid'])} not a date")
+        for id, value in result["invalid"][:MAX_REPORTED_INVALID]:
+            print(f"  {id}: {value!r}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
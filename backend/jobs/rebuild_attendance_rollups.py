@@ -0,0 +1,32 @@
+"""Recompute the attendance rollups (per staff member and class, by day, week and month) from the records.
+
+Safe to run while the app is serving: corrections are applied as deltas, and
+the run stops if another rebuild (or a worker's first build) holds the lock.
+Run against the configured MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.jobs.rebuild_attendance_rollups [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from ..database import mongo
+from ..services.attendance_rollup_service import AttendanceRollupService
+from ..services.job_locks import JobLockedError
+
+async def main(dry_run: bool):
+    await mongo.connect()
+    try:
+        drifted = await AttendanceRollupService.rebuild(dry_run)
+        action = "found" if dry_run else "repaired"
+        print(f"{action} {drifted} drifted rollup(s)")
+    except JobLockedError as e:
+        sys.exit(str(e))
+    finally:
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
@@ -0,0 +1,38 @@
+"""Recompute the per-staff stats counters from source data and report drift.
+
+Can run alongside the app; counters a write changes mid-run are left for the
+next run. Exits if another rebuild is in progress.
+Run against the configured MongoDB (uses MONGO_URL / DB_NAME from backend/.env):
+
+    python -m backend.jobs.rebuild_staff_stats [--staff-id ID ...] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from ..database import mongo
+from ..services.staff_stats_service import StaffStatsService
+from ..services.job_locks import JobLockedError
+
+async def main(staff_ids, dry_run: bool):
+    await mongo.connect()
+    try:
+        drift = await StaffStatsService.rebuild(staff_ids, dry_run)
+        for entry in drift:
+            changes = ", ".join(
+                f"{field} {values['stored']} -> {values['actual']}" for field, values in entry["drift"].items()
+            )
+            print(f"{entry['staff_id']}: {changes}")
+        action = "found" if dry_run else "repaired"
+        print(f"{action} drift for {len(drift)} staff member(s)")
+    except JobLockedError as e:
+        sys.exit(str(e))
+    finally:
+        mongo.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--staff-id", action="append", dest="staff_ids")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.staff_ids, args.dry_run))
@@ -1,8 +1,34 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, BeforeValidator, Field
+from typing import Annotated, List, Optional, Dict, Any, Generic, TypeVar, Union
+# Date rather than date: several models have a field called `date`
+from datetime import date as Date, datetime
 from enum import Enum
-import uuid
+from .ids import new_id
+from .services.dates import parse_date
+
+T = TypeVar("T")
+
+def _request_date(value: Any) -> Any:
+    if isinstance(value, str):
+        # A ValueError becomes a 422 naming the field
+        return parse_date(value)
+    return value
+
+def _stored_date(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return parse_date(value)
+        except ValueError:
+            return value
+    return value
+
+# Dates sent by clients: YYYY-MM-DD, or another format older clients used (see parse_date)
+RequestDate = Annotated[Date, BeforeValidator(_request_date)]
+OptionalRequestDate = Annotated[Optional[Date], BeforeValidator(_request_date)]
+# Dates read back from the database. A string left behind by the date migration
+# because it is not a date at all is returned as stored rather than failing the read
+StoredDate = Annotated[Union[Date, str], BeforeValidator(_stored_date)]
+OptionalStoredDate = Annotated[Optional[Union[Date, str]], BeforeValidator(_stored_date)]
 
 # Enums for status fields
 class ScheduleStatus(str, Enum):
@@ -20,6 +46,11 @@ class FormStatus(str, Enum):
     draft = "draft"
     submitted = "submitted"
 
+class RollupGranularity(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
 class Priority(str, Enum):
     low = "low"
     medium = "medium"
@@ -27,7 +58,7 @@ class Priority(str, Enum):
 
 # Staff Profile Models
 class StaffProfile(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     role: str
     employee_id: str
@@ -64,7 +95,7 @@ class StaffProfileUpdate(BaseModel):
 
 # Schedule Models
 class Schedule(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     time: str
     subject: str
     class_name: str = Field(alias="class")
@@ -103,7 +134,7 @@ class ScheduleUpdate(BaseModel):
 
 # Student Models
 class Student(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     status: AttendanceStatus = AttendanceStatus.present
 
@@ -113,9 +144,9 @@ class StudentCreate(BaseModel):
 
 # Attendance Models
 class AttendanceRecord(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     class_name: str
-    date: str
+    date: StoredDate
     total_students: int
     present: int
     absent: int
@@ -125,17 +156,102 @@ class AttendanceRecord(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class AttendanceRecordView(BaseModel):
+    """Attendance record read with a projection; only the selected fields are set"""
+    id: str
+    class_name: Optional[str] = None
+    date: OptionalStoredDate = None
+    total_students: Optional[int] = None
+    present: Optional[int] = None
+    absent: Optional[int] = None
+    late: Optional[int] = None
+    students: Optional[List[Student]] = None
+    staff_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class AttendanceRecordCreate(BaseModel):
     class_name: str
-    date: str
+    date: RequestDate
     students: List[StudentCreate]
     staff_id: str
 
 class AttendanceRecordUpdate(BaseModel):
     class_name: Optional[str] = None
-    date: Optional[str] = None
+    date: OptionalRequestDate = None
     students: Optional[List[Student]] = None
 
+class StudentStatusChange(BaseModel):
+    record_id: str
+    student_id: str
+    status: AttendanceStatus
+
+class BulkStudentStatusUpdate(BaseModel):
+    changes: List[StudentStatusChange] = Field(..., min_length=1, max_length=1000)
+
+class StudentStatusChangeResult(BaseModel):
+    record_id: str
+    student_id: str
+    status: AttendanceStatus
+    result: str  # updated, unchanged, record_not_found, student_not_found or conflict
+
+class BulkStudentStatusResult(BaseModel):
+    results: List[StudentStatusChangeResult]
+    records: List[AttendanceRecord]
+
+# Attendance Analytics Models
+class StudentAttendanceAnalytics(BaseModel):
+    student_id: str
+    name: str
+    class_name: str
+    sessions: int
+    present: int
+    absent: int
+    late: int
+    attendance_rate: float
+    absence_rate: float
+    late_rate: float
+    longest_absence_streak: int
+    current_absence_streak: int
+    chronic_absence: bool
+    lateness_trend: float  # percentage points of late rate per 30 days
+
+class AttendanceAnalytics(BaseModel):
+    date_from: Optional[Date] = None
+    date_to: Optional[Date] = None
+    records: int
+    dates: int
+    total_students: int
+    chronic_absence_count: int
+    students: List[StudentAttendanceAnalytics]
+
+class AttendanceTrendPoint(BaseModel):
+    period: str  # first day of the day, ISO week or month
+    records: int
+    total_students: int
+    present: int
+    absent: int
+    late: int
+    attendance_rate: float
+
+class AttendanceTrend(BaseModel):
+    scope: str  # staff or class
+    key: str
+    granularity: RollupGranularity
+    points: List[AttendanceTrendPoint]
+
+# Import Models
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResult(BaseModel):
+    format: str
+    total_rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
 # Template Models
 class TemplateField(BaseModel):
     name: str
@@ -145,7 +261,7 @@ class TemplateField(BaseModel):
     options: Optional[List[str]] = None
 
 class Template(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     category: str
     fields: List[TemplateField]
@@ -159,7 +275,7 @@ class TemplateCreate(BaseModel):
 
 # Form Submission Models
 class FormSubmission(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     template_name: str
     template_id: str
     data: Dict[str, Any]
@@ -181,7 +297,7 @@ class FormSubmissionUpdate(BaseModel):
 
 # Voice Transcription Models
 class VoiceTranscription(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     text: str
     duration: int  # Duration in seconds
     staff_id: str
@@ -194,7 +310,7 @@ class VoiceTranscriptionCreate(BaseModel):
 
 # Voice to Template Conversion Models
 class VoiceToTemplateConversion(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     template_name: str
     original_transcription: str
     extracted_data: Dict[str, Any]
@@ -211,10 +327,10 @@ class VoiceToTemplateConversionCreate(BaseModel):
 
 # Dashboard Models
 class Task(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     task: str
     priority: Priority
-    due_date: str
+    due_date: StoredDate
     staff_id: str
     completed: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -222,21 +338,29 @@ class Task(BaseModel):
 class TaskCreate(BaseModel):
     task: str
     priority: Priority
-    due_date: str
+    due_date: RequestDate
     staff_id: str
 
 class Activity(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     activity: str
+    type: str = "general"
     staff_id: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ActivityCreate(BaseModel):
     activity: str
+    type: str = "general"
+    staff_id: str
+
+class ActivityRollup(BaseModel):
     staff_id: str
+    day: str
+    type: str
+    count: int
 
 class Announcement(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     title: str
     content: str
     date: str
@@ -252,4 +376,10 @@ class DashboardData(BaseModel):
     upcoming_tasks: List[Task]
     recent_activities: List[Activity]
     announcements: List[Announcement]
-    stats: Dict[str, int]
\ No newline at end of file
+    stats: Dict[str, int]
+    degraded_sections: List[str] = []
+
+# Pagination Models
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
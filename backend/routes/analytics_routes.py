@@ -0,0 +1,59 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Optional
+from datetime import date
+from ..models import AttendanceAnalytics, AttendanceTrend, RollupGranularity
+from ..services.attendance_analytics import AttendanceAnalyticsService, InvalidAnalyticsQueryError, DEFAULT_CHRONIC_ABSENCE_THRESHOLD
+from .trusted import trusted_response
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+@router.get("/attendance", response_model=AttendanceAnalytics)
+async def get_student_attendance_analytics(
+    staff_id: Optional[str] = Query(None),
+    class_name: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, description="First date to include (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last date to include (YYYY-MM-DD)"),
+    below_rate: Optional[float] = Query(None, ge=0, le=100, description="Only students whose attendance rate is below this percentage"),
+    chronic_threshold: float = Query(DEFAULT_CHRONIC_ABSENCE_THRESHOLD, gt=0, le=1, description="Share of absent sessions that flags chronic absence")
+):
+    """Per-student attendance rates, absence streaks, chronic-absence flags and lateness trends, lowest attendance first.
+
+    Give staff_id, class_name or both.
+    """
+    try:
+        analytics = await AttendanceAnalyticsService.get_student_analytics(
+            staff_id, class_name, date_from, date_to, chronic_threshold, below_rate
+        )
+        return trusted_response(analytics)
+    except InvalidAnalyticsQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing attendance analytics: {str(e)}"
+        )
+
+@router.get("/attendance/trend", response_model=AttendanceTrend)
+async def get_attendance_trend(
+    staff_id: Optional[str] = Query(None),
+    class_name: Optional[str] = Query(None),
+    granularity: RollupGranularity = Query(RollupGranularity.week),
+    date_from: Optional[date] = Query(None, description="First date to include (YYYY-MM-DD); its whole period is included"),
+    date_to: Optional[date] = Query(None, description="Last date to include (YYYY-MM-DD)")
+):
+    """Attendance totals and rate per day, week or month for one staff member or one class, oldest first"""
+    try:
+        return await AttendanceAnalyticsService.get_trend(staff_id, class_name, granularity, date_from, date_to)
+    except InvalidAnalyticsQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving attendance trend: {str(e)}"
+        )
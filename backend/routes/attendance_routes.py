@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from typing import List, Optional
-from ..models import AttendanceRecord, AttendanceRecordCreate, AttendanceRecordUpdate, AttendanceStatus
-from ..services.attendance_service import AttendanceService
+from datetime import date
+from ..models import AttendanceRecord, AttendanceRecordCreate, AttendanceRecordUpdate, AttendanceRecordView, AttendanceStatus, Page, BulkStudentStatusUpdate, BulkStudentStatusResult
+from ..services.attendance_service import AttendanceService, InvalidFieldSelectionError
 from ..services.dashboard_service import DashboardService
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from .trusted import trusted_response
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
@@ -11,11 +14,13 @@ async def create_attendance_record(attendance_data: AttendanceRecordCreate):
     """Create a new attendance record"""
     try:
         record = await AttendanceService.create_attendance_record(attendance_data)
+        DashboardService.invalidate_staff(record.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             attendance_data.staff_id,
-            f"Created attendance record for {attendance_data.class_name}"
+            f"Created attendance record for {attendance_data.class_name}",
+            activity_type="attendance.created"
         )
         
         return record
@@ -25,24 +30,53 @@ async def create_attendance_record(attendance_data: AttendanceRecordCreate):
             detail=f"Error creating attendance record: {str(e)}"
         )
 
-@router.get("/staff/{staff_id}", response_model=List[AttendanceRecord])
-async def get_attendance_records_by_staff(staff_id: str):
-    """Get all attendance records for a staff member"""
+@router.get("/staff/{staff_id}", response_model=Page[AttendanceRecordView], response_model_exclude_unset=True)
+async def get_attendance_records_by_staff(
+    staff_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="'summary' or a comma-separated list of fields to return"),
+    date_from: Optional[date] = Query(None, description="First date to include (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last date to include (YYYY-MM-DD)")
+):
+    """Get a page of attendance records for a staff member, newest first.
+
+    With fields=summary the per-student arrays are left out; open a single
+    record to get them. date_from / date_to fetch a week or a term in one
+    listing instead of one call per date.
+    """
     try:
-        records = await AttendanceService.get_attendance_records_by_staff(staff_id)
-        return records
+        projection = AttendanceService.resolve_projection(fields)
+        records = await AttendanceService.get_attendance_records_by_staff(staff_id, limit, after, projection, date_from, date_to, trusted=True)
+        return trusted_response(records)
+    except InvalidFieldSelectionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving attendance records: {str(e)}"
         )
 
-@router.get("/staff/{staff_id}/date/{date}", response_model=List[AttendanceRecord])
-async def get_attendance_records_by_date(staff_id: str, date: str):
+@router.get("/staff/{staff_id}/date/{date}", response_model=List[AttendanceRecordView], response_model_exclude_unset=True)
+async def get_attendance_records_by_date(staff_id: str, date: date, fields: Optional[str] = Query(None, description="'summary' or a comma-separated list of fields to return")):
     """Get attendance records for a specific date"""
     try:
-        records = await AttendanceService.get_attendance_records_by_date(staff_id, date)
-        return records
+        projection = AttendanceService.resolve_projection(fields)
+        records = await AttendanceService.get_attendance_records_by_date(staff_id, date, projection, trusted=True)
+        return trusted_response(records)
+    except InvalidFieldSelectionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -86,11 +120,13 @@ async def update_attendance_record(record_id: str, update_data: AttendanceRecord
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update attendance record"
             )
+        DashboardService.invalidate_staff(existing_record.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             existing_record.staff_id,
-            f"Updated attendance for {existing_record.class_name}"
+            f"Updated attendance for {existing_record.class_name}",
+            activity_type="attendance.updated"
         )
         
         return updated_record
@@ -103,39 +139,25 @@ async def update_attendance_record(record_id: str, update_data: AttendanceRecord
         )
 
 @router.patch("/{record_id}/student/{student_id}/status", response_model=AttendanceRecord)
-async def update_student_attendance(record_id: str, student_id: str, status: AttendanceStatus):
+async def update_student_attendance(record_id: str, student_id: str, student_status: AttendanceStatus = Query(..., alias="status")):
     """Update specific student's attendance status"""
     try:
-        # Check if record exists
-        existing_record = await AttendanceService.get_attendance_record(record_id)
-        if not existing_record:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Attendance record not found"
-            )
-        
-        # Check if student exists in the record
-        student_exists = any(student.id == student_id for student in existing_record.students)
-        if not student_exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Student not found in attendance record"
-            )
-        
-        updated_record = await AttendanceService.update_student_attendance(record_id, student_id, status)
+        updated_record = await AttendanceService.update_student_attendance(record_id, student_id, student_status)
         if not updated_record:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update student attendance"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Attendance record or student not found"
             )
+        DashboardService.invalidate_staff(updated_record.staff_id)
         
         # Find student name for logging
-        student_name = next((s.name for s in existing_record.students if s.id == student_id), "Student")
+        student_name = next((s.name for s in updated_record.students if s.id == student_id), "Student")
         
         # Log activity
         await DashboardService.log_activity(
-            existing_record.staff_id,
-            f"Marked {student_name} as {status.value} in {existing_record.class_name}"
+            updated_record.staff_id,
+            f"Marked {student_name} as {student_status.value} in {updated_record.class_name}",
+            activity_type="attendance.marked"
         )
         
         return updated_record
@@ -147,6 +169,34 @@ async def update_student_attendance(record_id: str, student_id: str, status: Att
             detail=f"Error updating student attendance: {str(e)}"
         )
 
+@router.patch("/students/status", response_model=BulkStudentStatusResult)
+async def update_student_attendance_bulk(update: BulkStudentStatusUpdate):
+    """Update many students' attendance statuses across one or more records in one request"""
+    try:
+        result = await AttendanceService.update_student_attendance_bulk(update.changes)
+        
+        # Log one summary activity per staff member instead of one per student
+        records_by_staff: dict = {}
+        for record in result.records:
+            DashboardService.invalidate_staff(record.staff_id)
+            records_by_staff.setdefault(record.staff_id, []).append(record)
+        for staff_id, records in records_by_staff.items():
+            record_ids = {record.id for record in records}
+            updated_count = sum(1 for item in result.results if item.result == "updated" and item.record_id in record_ids)
+            class_names = ", ".join(dict.fromkeys(record.class_name for record in records))
+            await DashboardService.log_activity(
+                staff_id,
+                f"Updated attendance for {updated_count} students in {class_names}",
+                activity_type="attendance.marked"
+            )
+        
+        return result
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating student attendance: {str(e)}"
+        )
+
 @router.delete("/{record_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_attendance_record(record_id: str):
     """Delete attendance record"""
@@ -165,11 +215,13 @@ async def delete_attendance_record(record_id: str):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to delete attendance record"
             )
+        DashboardService.invalidate_staff(existing_record.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             existing_record.staff_id,
-            f"Deleted attendance record for {existing_record.class_name}"
+            f"Deleted attendance record for {existing_record.class_name}",
+            activity_type="attendance.deleted"
         )
         
     except HTTPException:
@@ -181,10 +233,15 @@ async def delete_attendance_record(record_id: str):
         )
 
 @router.get("/staff/{staff_id}/stats")
-async def get_attendance_stats(staff_id: str):
+async def get_attendance_stats(
+    staff_id: str,
+    date_from: Optional[date] = Query(None, description="First date to include (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last date to include (YYYY-MM-DD)"),
+    class_name: Optional[str] = Query(None)
+):
     """Get attendance statistics for a staff member"""
     try:
-        stats = await AttendanceService.get_attendance_stats(staff_id)
+        stats = await AttendanceService.get_attendance_stats(staff_id, date_from, date_to, class_name)
         return stats
     except Exception as e:
         raise HTTPException(
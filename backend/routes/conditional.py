@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response, status
+
+# Conditional GET helpers: routes compute validators from a raw document or a
+# collection version and answer 304 before building or serializing any model.
+
+def document_etag(document: Dict[str, Any]) -> str:
+    """Strong ETag for a single document: its id and last-change time in milliseconds"""
+    changed = document.get("updated_at") or document.get("created_at")
+    millis = int(changed.replace(tzinfo=timezone.utc).timestamp() * 1000) if changed else 0
+    return f'"{document["id"]}.{millis}"'
+
+def version_etag(version: int) -> str:
+    """Strong ETag for a listing backed by a collection version counter"""
+    return f'"v{version}"'
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True if the client's cached copy is current. If-None-Match wins over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = _http_date(last_modified)
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
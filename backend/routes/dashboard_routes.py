@@ -1,15 +1,24 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from ..models import DashboardData, Task, TaskCreate, Activity, ActivityCreate, Announcement, AnnouncementCreate
-from ..services.dashboard_service import DashboardService
+from fastapi import APIRouter, HTTPException, status, Query, Response
+from typing import List, Optional
+from datetime import date
+from ..models import DashboardData, Task, TaskCreate, Activity, ActivityCreate, ActivityRollup, Announcement, AnnouncementCreate, Page
+from ..services.dashboard_service import DashboardService, dashboard_cache
+from ..services.staff_stats_service import StaffStatsService
+from ..services.job_locks import JobLockedError
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 @router.get("/staff/{staff_id}", response_model=DashboardData)
-async def get_dashboard_data(staff_id: str):
+async def get_dashboard_data(staff_id: str, response: Response):
     """Get comprehensive dashboard data for a staff member"""
     try:
-        dashboard_data = await DashboardService.get_dashboard_data(staff_id)
+        timings = {}
+        dashboard_data = await DashboardService.get_dashboard_data(staff_id, timings)
+        if timings:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{section};dur={duration:.1f}" for section, duration in timings.items()
+            )
         return dashboard_data
     except Exception as e:
         raise HTTPException(
@@ -17,12 +26,35 @@ async def get_dashboard_data(staff_id: str):
             detail=f"Error retrieving dashboard data: {str(e)}"
         )
 
+@router.get("/cache/stats")
+async def get_dashboard_cache_stats():
+    """Hit, miss and eviction counters for this worker's dashboard snapshot cache"""
+    return dashboard_cache.stats()
+
+@router.post("/stats/rebuild")
+async def rebuild_staff_stats(staff_id: Optional[str] = Query(None), dry_run: bool = Query(False)):
+    """Recompute the per-staff stats counters from source data and report any drift"""
+    try:
+        drift = await StaffStatsService.rebuild([staff_id] if staff_id else None, dry_run)
+        if not dry_run:
+            for entry in drift:
+                DashboardService.invalidate_staff(entry["staff_id"])
+        return {"dry_run": dry_run, "drifted": len(drift), "staff": drift}
+    except JobLockedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error rebuilding staff stats: {str(e)}"
+        )
+
 # Task endpoints
 @router.post("/tasks", response_model=Task, status_code=status.HTTP_201_CREATED)
 async def create_task(task_data: TaskCreate):
     """Create a new task"""
     try:
         task = await DashboardService.create_task(task_data)
+        DashboardService.invalidate_staff(task.staff_id)
         return task
     except Exception as e:
         raise HTTPException(
@@ -30,12 +62,23 @@ async def create_task(task_data: TaskCreate):
             detail=f"Error creating task: {str(e)}"
         )
 
-@router.get("/tasks/staff/{staff_id}", response_model=List[Task])
-async def get_tasks_by_staff(staff_id: str):
-    """Get all tasks for a staff member"""
+@router.get("/tasks/staff/{staff_id}", response_model=Page[Task])
+async def get_tasks_by_staff(
+    staff_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None),
+    due_from: Optional[date] = Query(None, description="First due date to include (YYYY-MM-DD)"),
+    due_to: Optional[date] = Query(None, description="Last due date to include (YYYY-MM-DD)")
+):
+    """Get a page of tasks for a staff member, soonest due first, optionally due within a date range"""
     try:
-        tasks = await DashboardService.get_tasks_by_staff(staff_id)
+        tasks = await DashboardService.get_tasks_by_staff(staff_id, limit, after, due_from, due_to)
         return tasks
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -52,11 +95,13 @@ async def complete_task(task_id: str):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Task not found"
             )
+        DashboardService.invalidate_staff(task.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             task.staff_id,
-            f"Completed task: {task.task}"
+            f"Completed task: {task.task}",
+            activity_type="task.completed"
         )
         
         return task
@@ -93,12 +138,26 @@ async def get_recent_activities_by_staff(staff_id: str, limit: int = 10):
             detail=f"Error retrieving activities: {str(e)}"
         )
 
+@router.get("/activities/staff/{staff_id}/rollups", response_model=List[ActivityRollup])
+async def get_activity_rollups(staff_id: str, date_from: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+                               date_to: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)")):
+    """Get daily activity counts per type for a staff member, including days past the retention window"""
+    try:
+        rollups = await DashboardService.get_activity_rollups(staff_id, date_from, date_to)
+        return rollups
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving activity rollups: {str(e)}"
+        )
+
 # Announcement endpoints
 @router.post("/announcements", response_model=Announcement, status_code=status.HTTP_201_CREATED)
 async def create_announcement(announcement_data: AnnouncementCreate):
     """Create a new announcement"""
     try:
         announcement = await DashboardService.create_announcement(announcement_data)
+        DashboardService.invalidate_announcements()
         return announcement
     except Exception as e:
         raise HTTPException(
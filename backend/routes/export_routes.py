@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
+from datetime import date
+from ..services.export_service import ExportService, InvalidExportError
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _streaming_response(chunks: AsyncIterator[bytes], name: str, file_format: str, compress: bool) -> StreamingResponse:
+    filename = f"{name}.{file_format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if compress else _MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/attendance")
+async def export_attendance(
+    file_format: str = Query("ndjson", alias="format"),
+    gzip: bool = Query(False),
+    staff_id: Optional[str] = Query(None),
+    class_name: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, description="First date to include (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last date to include (YYYY-MM-DD)")
+):
+    """Stream attendance records as NDJSON (one record per line) or CSV (one student per row)"""
+    try:
+        chunks = ExportService.export_attendance(file_format, gzip, staff_id, class_name, date_from, date_to)
+        return _streaming_response(chunks, "attendance-export", file_format, gzip)
+    except InvalidExportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting attendance records: {str(e)}"
+        )
+
+@router.get("/submissions")
+async def export_submissions(
+    file_format: str = Query("ndjson", alias="format"),
+    gzip: bool = Query(False),
+    staff_id: Optional[str] = Query(None),
+    template_id: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, description="First created_at day to include (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Last created_at day to include (YYYY-MM-DD)")
+):
+    """Stream form submissions as NDJSON or CSV, optionally limited to a created_at date range"""
+    try:
+        chunks = ExportService.export_submissions(file_format, gzip, staff_id, template_id, date_from, date_to)
+        return _streaming_response(chunks, "submissions-export", file_format, gzip)
+    except InvalidExportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting form submissions: {str(e)}"
+        )
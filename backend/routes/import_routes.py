@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from typing import Optional
+from ..models import ImportResult
+from ..services.import_service import ImportService, InvalidImportError
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+_CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+def _resolve_format(request: Request, file_format: Optional[str]) -> str:
+    """Use the `format` query parameter, else infer it from the Content-Type of the raw upload"""
+    if file_format:
+        return file_format
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    return _CONTENT_TYPE_FORMATS.get(content_type, content_type or "unknown")
+
+# The upload is the raw request body (not multipart), read as it arrives:
+#   curl -X POST -H "Content-Type: text/csv" --data-binary @schedules.csv .../api/import/schedules
+
+@router.post("/schedules", response_model=ImportResult)
+async def import_schedules(request: Request, file_format: Optional[str] = Query(None, alias="format")):
+    """Import schedule rows from a CSV or NDJSON upload"""
+    try:
+        return await ImportService.import_schedules(request.stream(), _resolve_format(request, file_format))
+    except InvalidImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing schedules: {str(e)}"
+        )
+
+@router.post("/staff", response_model=ImportResult)
+async def import_staff_profiles(request: Request, file_format: Optional[str] = Query(None, alias="format")):
+    """Import staff profiles from a CSV (subjects separated by ';') or NDJSON upload"""
+    try:
+        return await ImportService.import_staff_profiles(request.stream(), _resolve_format(request, file_format))
+    except InvalidImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing staff profiles: {str(e)}"
+        )
+
+@router.post("/attendance", response_model=ImportResult)
+async def import_attendance_records(request: Request, file_format: Optional[str] = Query(None, alias="format")):
+    """Import attendance records from NDJSON (one record per line) or CSV (one student per row)"""
+    try:
+        return await ImportService.import_attendance_records(request.stream(), _resolve_format(request, file_format))
+    except InvalidImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing attendance records: {str(e)}"
+        )
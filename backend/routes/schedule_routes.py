@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
 from typing import List, Optional
-from ..models import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleStatus
+from ..models import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleStatus, Page
 from ..services.schedule_service import ScheduleService
 from ..services.dashboard_service import DashboardService
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from .conditional import document_etag, version_etag, is_not_modified, not_modified_response, set_validators
+from .trusted import trusted_response
 
 router = APIRouter(prefix="/schedule", tags=["schedule"])
 
@@ -11,11 +14,13 @@ async def create_schedule(schedule_data: ScheduleCreate):
     """Create a new schedule entry"""
     try:
         schedule = await ScheduleService.create_schedule(schedule_data)
+        DashboardService.invalidate_staff(schedule.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             schedule_data.staff_id,
-            f"Added new class: {schedule_data.subject} - {schedule_data.class_name}"
+            f"Added new class: {schedule_data.subject} - {schedule_data.class_name}",
+            activity_type="schedule.created"
         )
         
         return schedule
@@ -25,12 +30,23 @@ async def create_schedule(schedule_data: ScheduleCreate):
             detail=f"Error creating schedule: {str(e)}"
         )
 
-@router.get("/staff/{staff_id}", response_model=List[Schedule])
-async def get_schedules_by_staff(staff_id: str):
-    """Get all schedules for a staff member"""
+@router.get("/staff/{staff_id}", response_model=Page[Schedule])
+async def get_schedules_by_staff(request: Request, staff_id: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = Query(None)):
+    """Get a page of schedules for a staff member; answers 304 when the client's copy is current"""
     try:
-        schedules = await ScheduleService.get_schedules_by_staff(staff_id)
-        return schedules
+        version, last_modified = await ScheduleService.get_schedules_version(staff_id)
+        etag = version_etag(version)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        schedules = await ScheduleService.get_schedules_by_staff(staff_id, limit, after, trusted=True)
+        response = trusted_response(schedules)
+        set_validators(response, etag, last_modified)
+        return response
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -38,27 +54,49 @@ async def get_schedules_by_staff(staff_id: str):
         )
 
 @router.get("/staff/{staff_id}/day/{day}", response_model=List[Schedule])
-async def get_schedules_by_day(staff_id: str, day: str):
-    """Get schedules for a specific day"""
+async def get_schedules_by_day(staff_id: str, day: str, request: Request):
+    """Get schedules for a specific day; answers 304 when the client's copy is current"""
     try:
-        schedules = await ScheduleService.get_schedules_by_day(staff_id, day)
-        return schedules
+        version, last_modified = await ScheduleService.get_schedules_version(staff_id)
+        etag = version_etag(version)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        schedules = await ScheduleService.get_schedules_by_day(staff_id, day, trusted=True)
+        response = trusted_response(schedules)
+        set_validators(response, etag, last_modified)
+        return response
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving schedules for {day}: {str(e)}"
         )
 
+@router.get("/stats")
+async def get_schedule_stats_for_staff(staff_ids: List[str] = Query(..., alias="staff_id", description="Repeat for each staff member")):
+    """Get schedule statistics for several staff members, keyed by staff id"""
+    try:
+        stats = await ScheduleService.get_schedule_stats_for_staff(staff_ids)
+        return stats
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving schedule stats: {str(e)}"
+        )
+
 @router.get("/{schedule_id}", response_model=Schedule)
-async def get_schedule(schedule_id: str):
-    """Get schedule by ID"""
+async def get_schedule(schedule_id: str, request: Request, response: Response):
+    """Get schedule by ID; answers 304 when the client's copy is current"""
     try:
-        schedule = await ScheduleService.get_schedule(schedule_id)
+        schedule = await ScheduleService.get_schedule_document(schedule_id)
         if not schedule:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Schedule not found"
             )
+        etag = document_etag(schedule)
+        if is_not_modified(request, etag, schedule.get("updated_at")):
+            return not_modified_response(etag, schedule.get("updated_at"))
+        set_validators(response, etag, schedule.get("updated_at"))
         return schedule
     except HTTPException:
         raise
@@ -86,11 +124,13 @@ async def update_schedule(schedule_id: str, update_data: ScheduleUpdate):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update schedule"
             )
+        DashboardService.invalidate_staff(existing_schedule.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             existing_schedule.staff_id,
-            f"Updated schedule for {existing_schedule.subject}"
+            f"Updated schedule for {existing_schedule.subject}",
+            activity_type="schedule.updated"
         )
         
         return updated_schedule
@@ -120,11 +160,13 @@ async def update_schedule_status(schedule_id: str, status: ScheduleStatus):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update schedule status"
             )
+        DashboardService.invalidate_staff(existing_schedule.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             existing_schedule.staff_id,
-            f"Changed status of {existing_schedule.subject} to {status.value}"
+            f"Changed status of {existing_schedule.subject} to {status.value}",
+            activity_type="schedule.status_changed"
         )
         
         return updated_schedule
@@ -154,11 +196,13 @@ async def delete_schedule(schedule_id: str):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to delete schedule"
             )
+        DashboardService.invalidate_staff(existing_schedule.staff_id)
         
         # Log activity
         await DashboardService.log_activity(
             existing_schedule.staff_id,
-            f"Deleted schedule for {existing_schedule.subject}"
+            f"Deleted schedule for {existing_schedule.subject}",
+            activity_type="schedule.deleted"
         )
         
     except HTTPException:
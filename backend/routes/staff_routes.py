@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Request, Response
 from typing import List
 from ..models import StaffProfile, StaffProfileCreate, StaffProfileUpdate
 from ..services.staff_service import StaffService
+from .conditional import document_etag, is_not_modified, not_modified_response, set_validators
 
 router = APIRouter(prefix="/staff", tags=["staff"])
 
@@ -38,15 +39,19 @@ async def get_all_staff_profiles():
         )
 
 @router.get("/{staff_id}", response_model=StaffProfile)
-async def get_staff_profile(staff_id: str):
-    """Get staff profile by ID"""
+async def get_staff_profile(staff_id: str, request: Request, response: Response):
+    """Get staff profile by ID; answers 304 when the client's copy is current"""
     try:
-        profile = await StaffService.get_staff_profile(staff_id)
+        profile = await StaffService.get_staff_profile_document(staff_id)
         if not profile:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Staff profile not found"
             )
+        etag = document_etag(profile)
+        if is_not_modified(request, etag, profile.get("updated_at")):
+            return not_modified_response(etag, profile.get("updated_at"))
+        set_validators(response, etag, profile.get("updated_at"))
         return profile
     except HTTPException:
         raise
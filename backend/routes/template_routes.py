@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
 from typing import List, Optional
-from ..models import Template, TemplateCreate, FormSubmission, FormSubmissionCreate, FormSubmissionUpdate
+from ..models import Template, TemplateCreate, FormSubmission, FormSubmissionCreate, FormSubmissionUpdate, Page
 from ..services.template_service import TemplateService, FormSubmissionService
+from ..services.form_validation import FormValidationError
 from ..services.dashboard_service import DashboardService
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from .conditional import document_etag, version_etag, is_not_modified, not_modified_response, set_validators
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
@@ -20,9 +23,14 @@ async def create_template(template_data: TemplateCreate):
         )
 
 @router.get("/", response_model=List[Template])
-async def get_all_templates(category: Optional[str] = Query(None)):
-    """Get all templates, optionally filtered by category"""
+async def get_all_templates(request: Request, response: Response, category: Optional[str] = Query(None)):
+    """Get all templates, optionally filtered by category; answers 304 when the client's copy is current"""
     try:
+        version, last_modified = await TemplateService.get_templates_version()
+        etag = version_etag(version)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        set_validators(response, etag, last_modified)
         if category:
             templates = await TemplateService.get_templates_by_category(category)
         else:
@@ -35,15 +43,20 @@ async def get_all_templates(category: Optional[str] = Query(None)):
         )
 
 @router.get("/{template_id}", response_model=Template)
-async def get_template(template_id: str):
-    """Get template by ID"""
+async def get_template(template_id: str, request: Request, response: Response):
+    """Get template by ID; answers 304 when the client's copy is current"""
     try:
-        template = await TemplateService.get_template(template_id)
+        template = await TemplateService.get_template_document(template_id)
         if not template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Template not found"
             )
+        etag = document_etag(template)
+        last_modified = template.get("updated_at") or template.get("created_at")
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        set_validators(response, etag, last_modified)
         return template
     except HTTPException:
         raise
@@ -81,22 +94,33 @@ async def create_form_submission(submission_data: FormSubmissionCreate):
         # Log activity
         await DashboardService.log_activity(
             submission_data.staff_id,
-            f"Submitted {submission_data.template_name} form"
+            f"Submitted {submission_data.template_name} form",
+            activity_type="form.submitted"
         )
         
         return submission
+    except FormValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating form submission: {str(e)}"
         )
 
-@router.get("/submissions/staff/{staff_id}", response_model=List[FormSubmission])
-async def get_form_submissions_by_staff(staff_id: str):
-    """Get all form submissions for a staff member"""
+@router.get("/submissions/staff/{staff_id}", response_model=Page[FormSubmission])
+async def get_form_submissions_by_staff(staff_id: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = Query(None)):
+    """Get a page of form submissions for a staff member, newest first"""
     try:
-        submissions = await FormSubmissionService.get_form_submissions_by_staff(staff_id)
+        submissions = await FormSubmissionService.get_form_submissions_by_staff(staff_id, limit, after)
         return submissions
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -145,12 +169,18 @@ async def update_form_submission(submission_id: str, update_data: FormSubmission
         if update_data.status and update_data.status != existing_submission.status:
             await DashboardService.log_activity(
                 existing_submission.staff_id,
-                f"Updated {existing_submission.template_name} form status to {update_data.status.value}"
+                f"Updated {existing_submission.template_name} form status to {update_data.status.value}",
+                activity_type="form.status_changed"
             )
         
         return updated_submission
     except HTTPException:
         raise
+    except FormValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -179,7 +209,8 @@ async def delete_form_submission(submission_id: str):
         # Log activity
         await DashboardService.log_activity(
             existing_submission.staff_id,
-            f"Deleted {existing_submission.template_name} form submission"
+            f"Deleted {existing_submission.template_name} form submission",
+            activity_type="form.deleted"
         )
         
     except HTTPException:
@@ -0,0 +1,14 @@
+from typing import Any
+from fastapi.responses import ORJSONResponse
+from ..models import Page
+
+# Trusted-read fast path: list routes that opt in fetch response-shaped dicts
+# straight from the repository (no model building) and return them encoded by
+# orjson. Returning a Response makes FastAPI skip the response_model
+# validation and serialization, which is kept on the route for the API docs.
+
+def trusted_response(content: Any) -> ORJSONResponse:
+    """Encode trusted read results (a list, or a Page of response-shaped dicts) without re-validating them"""
+    if isinstance(content, Page):
+        content = {"items": content.items, "next_cursor": content.next_cursor}
+    return ORJSONResponse(content)
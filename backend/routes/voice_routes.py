@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from ..models import VoiceTranscription, VoiceTranscriptionCreate, VoiceToTemplateConversion, VoiceToTemplateConversionCreate
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Optional
+from ..models import VoiceTranscription, VoiceTranscriptionCreate, VoiceToTemplateConversion, VoiceToTemplateConversionCreate, Page
 from ..services.voice_service import VoiceService, VoiceToTemplateService
 from ..services.dashboard_service import DashboardService
+from ..services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 
 router = APIRouter(prefix="/voice", tags=["voice"])
 
@@ -16,7 +17,8 @@ async def create_voice_transcription(transcription_data: VoiceTranscriptionCreat
         # Log activity
         await DashboardService.log_activity(
             transcription_data.staff_id,
-            f"Created voice transcription ({transcription_data.duration}s)"
+            f"Created voice transcription ({transcription_data.duration}s)",
+            activity_type="voice.transcribed"
         )
         
         return transcription
@@ -26,12 +28,17 @@ async def create_voice_transcription(transcription_data: VoiceTranscriptionCreat
             detail=f"Error creating voice transcription: {str(e)}"
         )
 
-@router.get("/transcriptions/staff/{staff_id}", response_model=List[VoiceTranscription])
-async def get_voice_transcriptions_by_staff(staff_id: str):
-    """Get all voice transcriptions for a staff member"""
+@router.get("/transcriptions/staff/{staff_id}", response_model=Page[VoiceTranscription])
+async def get_voice_transcriptions_by_staff(staff_id: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = Query(None)):
+    """Get a page of voice transcriptions for a staff member, newest first"""
     try:
-        transcriptions = await VoiceService.get_voice_transcriptions_by_staff(staff_id)
+        transcriptions = await VoiceService.get_voice_transcriptions_by_staff(staff_id, limit, after)
         return transcriptions
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -85,7 +92,8 @@ async def process_voice_to_template(transcription: str, staff_id: str):
         # Log activity
         await DashboardService.log_activity(
             staff_id,
-            f"Processed voice to template with {result['confidence']*100:.0f}% confidence"
+            f"Processed voice to template with {result['confidence']*100:.0f}% confidence",
+            activity_type="voice.converted"
         )
         
         return result
@@ -104,7 +112,8 @@ async def create_voice_to_template_conversion(conversion_data: VoiceToTemplateCo
         # Log activity
         await DashboardService.log_activity(
             conversion_data.staff_id,
-            f"Saved AI conversion for {conversion_data.template_name}"
+            f"Saved AI conversion for {conversion_data.template_name}",
+            activity_type="voice.conversion_saved"
         )
         
         return conversion
@@ -114,12 +123,17 @@ async def create_voice_to_template_conversion(conversion_data: VoiceToTemplateCo
             detail=f"Error creating voice to template conversion: {str(e)}"
         )
 
-@router.get("/template-conversions/staff/{staff_id}", response_model=List[VoiceToTemplateConversion])
-async def get_voice_to_template_conversions_by_staff(staff_id: str):
-    """Get all voice to template conversions for a staff member"""
+@router.get("/template-conversions/staff/{staff_id}", response_model=Page[VoiceToTemplateConversion])
+async def get_voice_to_template_conversions_by_staff(staff_id: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = Query(None)):
+    """Get a page of voice to template conversions for a staff member, newest first"""
     try:
-        conversions = await VoiceToTemplateService.get_voice_to_template_conversions_by_staff(staff_id)
+        conversions = await VoiceToTemplateService.get_voice_to_template_conversions_by_staff(staff_id, limit, after)
         return conversions
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
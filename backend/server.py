@@ -1,13 +1,17 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 from pathlib import Path
 
 # Import database initialization
-from .database import init_database, close_database
+from .database import init_database, close_database, mongo
+from .services.staff_stats_service import StaffStatsService
+from .services.attendance_rollup_service import AttendanceRollupService
+from .services.date_migration import NativeDateMigration
+from .services.dashboard_service import activity_writer
 
 # Import route modules
 from .routes.staff_routes import router as staff_router
@@ -16,17 +20,60 @@ from .routes.attendance_routes import router as attendance_router
 from .routes.template_routes import router as template_router
 from .routes.voice_routes import router as voice_router
 from .routes.dashboard_routes import router as dashboard_router
+from .routes.import_routes import router as import_router
+from .routes.export_routes import router as export_router
+from .routes.analytics_routes import router as analytics_router
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'staff_utility_app')]
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def build_derived_data():
+    """Build the stats counters and attendance rollups if they never have been; runs in the background"""
+    try:
+        await StaffStatsService.ensure_initialized()
+        await AttendanceRollupService.ensure_initialized()
+    except Exception as e:
+        logger.error(f"❌ Error building stats counters and attendance rollups: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared MongoDB connection on startup and close it on shutdown"""
+    logger.info("🚀 Starting up Staff Utility App API...")
+    try:
+        await init_database()
+        # Range queries miss string dates, so they are converted before serving
+        await NativeDateMigration.ensure_migrated()
+        # Serving starts right away; the first build can take a while on a large database
+        derived_data_build = asyncio.create_task(build_derived_data())
+        activity_writer.start()
+        logger.info("✅ Database initialized successfully")
+    except Exception as e:
+        logger.error(f"❌ Error initializing database: {e}")
+        raise
+    
+    yield
+    
+    logger.info("🔄 Shutting down Staff Utility App API...")
+    derived_data_build.cancel()
+    with suppress(asyncio.CancelledError):
+        await derived_data_build
+    try:
+        # Queued activity entries are written before the connection goes away
+        await activity_writer.stop()
+        await close_database()
+        logger.info("✅ Database connection closed successfully")
+    except Exception as e:
+        logger.error(f"❌ Error closing database connection: {e}")
 
 # Create the main app without a prefix
-app = FastAPI(title="Staff Utility App API", version="1.0.0", description="Voice-Enabled Staff Utility Application for Educational Institutions")
+app = FastAPI(title="Staff Utility App API", version="1.0.0", description="Voice-Enabled Staff Utility Application for Educational Institutions", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -44,6 +91,16 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@api_router.get("/health/db-pool")
+async def db_pool_stats():
+    """Connection pool settings and checkout wait times for this worker"""
+    return mongo.pool_stats()
+
+@api_router.get("/health/activity-queue")
+async def activity_queue_stats():
+    """Depth, drop count and flush latency of this worker's write-behind activity queue"""
+    return activity_writer.stats()
+
 # Include all route modules
 api_router.include_router(staff_router)
 api_router.include_router(schedule_router)
@@ -51,6 +108,9 @@ api_router.include_router(attendance_router)
 api_router.include_router(template_router)
 api_router.include_router(voice_router)
 api_router.include_router(dashboard_router)
+api_router.include_router(import_router)
+api_router.include_router(export_router)
+api_router.include_router(analytics_router)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -64,35 +124,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-@app.on_event("startup")
-async def startup_db_client():
-    """Initialize database on startup"""
-    logger.info("🚀 Starting up Staff Utility App API...")
-    try:
-        await init_database()
-        logger.info("✅ Database initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Error initializing database: {e}")
-        raise
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    """Close database connection on shutdown"""
-    logger.info("🔄 Shutting down Staff Utility App API...")
-    try:
-        await close_database()
-        client.close()
-        logger.info("✅ Database connection closed successfully")
-    except Exception as e:
-        logger.error(f"❌ Error closing database connection: {e}")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from pymongo import UpdateOne, WriteConcern
+from ..database import activity_buckets_collection, activity_rollups_collection
+from ..models import Activity, ActivityRollup
+
+# Events are kept this many days after the day they happened, then removed by the TTL index
+ACTIVITY_RETENTION_DAYS = int(os.environ.get("ACTIVITY_RETENTION_DAYS", "90"))
+# A busy day spills into further buckets once one holds this many events
+ACTIVITY_BUCKET_MAX_EVENTS = int(os.environ.get("ACTIVITY_BUCKET_MAX_EVENTS", "500"))
+
+# Activity entries are not worth waiting on the journal for: acknowledged by the primary is enough
+ACTIVITY_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+class ActivityStore:
+    """Activities stored as per-staff, per-day buckets of events.
+
+    Each bucket document holds one staff member's events for one UTC day
+    (split further so none holds more than ACTIVITY_BUCKET_MAX_EVENTS) and
+    carries an expires_at that the TTL index enforces. Every event also increments a permanent
+    per-day, per-type count in activity_rollups, so history outlives the
+    retention window as totals. The recent feed reads the newest one or two
+    buckets instead of one document per event.
+    """
+
+    @staticmethod
+    def _event(document: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": document["id"],
+            "activity": document["activity"],
+            "type": document.get("type", "general"),
+            "created_at": document["created_at"],
+        }
+
+    @staticmethod
+    async def append(documents: List[Dict[str, Any]]):
+        """Store a batch of activity documents: one bucket upsert per (staff, day) chunk, one rollup $inc per type.
+
+        A chunk only goes into a bucket with room for all of it, otherwise it
+        starts a new one, so buckets never pass ACTIVITY_BUCKET_MAX_EVENTS.
+        Two workers appending to a full day at once can each start a bucket;
+        that leaves an extra, partly filled bucket for the day, which the
+        feed reads like any other, so no unique guard is kept.
+        """
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for document in documents:
+            day = document["created_at"].date().isoformat()
+            groups.setdefault((document["staff_id"], day), []).append(ActivityStore._event(document))
+
+        bucket_updates = []
+        rollup_counts: Dict[Tuple[str, str, str], int] = {}
+        for (staff_id, day), events in groups.items():
+            day_start = datetime.combine(events[0]["created_at"].date(), time.min)
+            for start in range(0, len(events), ACTIVITY_BUCKET_MAX_EVENTS):
+                chunk = events[start:start + ACTIVITY_BUCKET_MAX_EVENTS]
+                bucket_updates.append(UpdateOne(
+                    {"staff_id": staff_id, "day": day, "count": {"$lte": ACTIVITY_BUCKET_MAX_EVENTS - len(chunk)}},
+                    {
+                        "$push": {"events": {"$each": chunk}},
+                        "$inc": {"count": len(chunk)},
+                        "$setOnInsert": {
+                            "started_at": chunk[0]["created_at"],
+                            "expires_at": day_start + timedelta(days=ACTIVITY_RETENTION_DAYS + 1)
+                        }
+                    },
+                    upsert=True
+                ))
+            for event in events:
+                key = (staff_id, day, event["type"])
+                rollup_counts[key] = rollup_counts.get(key, 0) + 1
+
+        rollup_updates = [
+            UpdateOne({"staff_id": staff_id, "day": day, "type": activity_type}, {"$inc": {"count": count}}, upsert=True)
+            for (staff_id, day, activity_type), count in rollup_counts.items()
+        ]
+        await activity_buckets_collection.with_options(write_concern=ACTIVITY_WRITE_CONCERN).bulk_write(bucket_updates, ordered=False)
+        await activity_rollups_collection.with_options(write_concern=ACTIVITY_WRITE_CONCERN).bulk_write(rollup_updates, ordered=False)
+
+    @staticmethod
+    async def recent(staff_id: str, limit: int = 10) -> List[Activity]:
+        """Newest `limit` activities for a staff member, newest first"""
+        activities: List[Activity] = []
+        cursor = activity_buckets_collection.find(
+            {"staff_id": staff_id},
+            {"_id": 0, "events": {"$slice": -limit}}
+        ).sort([("day", -1), ("started_at", -1)]).batch_size(2)
+        async for bucket in cursor:
+            for event in reversed(bucket.get("events", [])):
+                activities.append(Activity(staff_id=staff_id, **event))
+                if len(activities) == limit:
+                    return activities
+        return activities
+
+    @staticmethod
+    async def rollups(staff_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[ActivityRollup]:
+        """Daily activity counts per type, oldest day first"""
+        query: Dict[str, Any] = {"staff_id": staff_id}
+        if date_from or date_to:
+            # Days are kept as YYYY-MM-DD strings, which sort as dates
+            query["day"] = {}
+            if date_from:
+                query["day"]["$gte"] = date_from.isoformat()
+            if date_to:
+                query["day"]["$lte"] = date_to.isoformat()
+        cursor = activity_rollups_collection.find(query, {"_id": 0}).sort([("day", 1), ("type", 1)])
+        return [ActivityRollup(**document) async for document in cursor]
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ActivityWriter:
+    """Write-behind queue for activity log entries.
+
+    Requests enqueue a document and return immediately; a background task
+    collects up to `batch_size` documents, or whatever arrived within
+    `flush_interval` seconds of the first, and hands them to `write_batch` in
+    one call. The queue is bounded: when it is full new entries are dropped
+    (and counted) rather than slowing requests down. stop() drains what is
+    still queued.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], Awaitable[None]], max_queue_size: int,
+                 batch_size: int, flush_interval: float):
+        self.write_batch = write_batch
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, document: Dict[str, Any]) -> bool:
+        """Queue a document for the next flush; False if it was dropped because the queue is full"""
+        if self._closing:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), self.flush_interval)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._closing:
+                # Draining: take what is queued without waiting for more
+                if self._queue.empty():
+                    break
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        try:
+            await self.write_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} activities: {e}")
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+            self._total_flush_ms += self.last_flush_ms
+            self.flushes += 1
+
+    async def _run(self):
+        while not (self._closing and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def stop(self):
+        """Write everything still queued, then stop the background task"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
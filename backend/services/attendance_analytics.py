@@ -0,0 +1,203 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date
+import logging
+import numpy as np
+from ..database import attendance_records_collection
+from ..models import RollupGranularity
+from .roster_service import RosterService, STATUS_CODES
+from .attendance_rollup_service import AttendanceRollupService
+from .dates import from_stored_date, date_range
+
+logger = logging.getLogger(__name__)
+
+# Cell value for a date on which the student's class has no record
+NOT_RECORDED = -1
+PRESENT, ABSENT, LATE = STATUS_CODES["present"], STATUS_CODES["absent"], STATUS_CODES["late"]
+
+# Absent on at least this share of recorded sessions
+DEFAULT_CHRONIC_ABSENCE_THRESHOLD = 0.10
+
+class InvalidAnalyticsQueryError(ValueError):
+    """Raised for malformed analytics filters"""
+
+class AttendanceMatrix:
+    """Dense student-by-date status matrix.
+
+    Rows are (class_name, student_id) pairs, columns are the dates that have
+    at least one record, and cells hold status codes or NOT_RECORDED. If a
+    class has more than one record on a date, the latest-created one wins.
+    """
+
+    def __init__(self, dates: List[date], students: List[Tuple[str, str, str]], codes: np.ndarray, records: int):
+        self.dates = dates
+        self.students = students  # (class_name, student_id, name) per row
+        self.codes = codes
+        self.records = records
+
+class AttendanceAnalyticsService:
+
+    @staticmethod
+    async def load_matrix(staff_id: Optional[str] = None, class_name: Optional[str] = None,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None) -> AttendanceMatrix:
+        """Read the matching records (only class, date and statuses) into an AttendanceMatrix.
+
+        The records are held in memory while the matrix is built, so a staff
+        member or class is required. Records whose roster is missing are
+        skipped and logged.
+        """
+        if not (staff_id or class_name):
+            raise InvalidAnalyticsQueryError("Give staff_id, class_name or both")
+        query: Dict[str, Any] = {}
+        if staff_id:
+            query["staff_id"] = staff_id
+        if class_name:
+            query["class_name"] = class_name
+        if date_from or date_to:
+            query["date"] = date_range(date_from, date_to)
+
+        projection = {"_id": 0, "id": 1, "class_name": 1, "date": 1, "roster_id": 1, "statuses": 1, "students": 1}
+        documents = await attendance_records_collection.find(query, projection).sort([("date", 1), ("id", 1)]).to_list(None)
+        rosters = await RosterService.get_rosters([document["roster_id"] for document in documents if "roster_id" in document])
+
+        rows: Dict[Tuple[str, str], int] = {}
+        students: List[Tuple[str, str, str]] = []
+        columns: Dict[date, int] = {}
+        roster_rows: Dict[str, np.ndarray] = {}
+        row_parts, column_parts, code_parts = [], [], []
+
+        def row_indexes(class_name: str, entries: List[Dict[str, Any]]) -> np.ndarray:
+            indexes = []
+            for entry in entries:
+                key = (class_name, entry["id"])
+                if key not in rows:
+                    rows[key] = len(students)
+                    students.append((class_name, entry["id"], entry["name"]))
+                indexes.append(rows[key])
+            return np.array(indexes, dtype=np.int64)
+
+        loaded = 0
+        for document in documents:
+            if "statuses" in document and document["roster_id"] not in rosters:
+                logger.error(f"Attendance record {document.get('id')} left out of analytics: roster {document['roster_id']} not found")
+                continue
+            loaded += 1
+            column = columns.setdefault(from_stored_date(document["date"]), len(columns))
+            if "statuses" in document:
+                roster_id = document["roster_id"]
+                if roster_id not in roster_rows:
+                    roster_rows[roster_id] = row_indexes(document["class_name"], rosters[roster_id]["students"])
+                indexes = roster_rows[roster_id][:len(document["statuses"])]
+                codes = document["statuses"]
+            else:
+                # Legacy record with its students embedded
+                embedded = document.get("students", [])
+                indexes = row_indexes(document["class_name"], embedded)
+                codes = [STATUS_CODES[student["status"]] for student in embedded]
+            row_parts.append(indexes)
+            column_parts.append(np.full(len(indexes), column, dtype=np.int64))
+            code_parts.append(np.asarray(codes, dtype=np.int8))
+
+        matrix = np.full((len(students), len(columns)), NOT_RECORDED, dtype=np.int8)
+        if row_parts:
+            # Records are in date then creation order, and later writes to a cell win
+            matrix[np.concatenate(row_parts), np.concatenate(column_parts)] = np.concatenate(code_parts)
+        return AttendanceMatrix(list(columns), students, matrix, loaded)
+
+    @staticmethod
+    def analyze(matrix: AttendanceMatrix, chronic_threshold: float = DEFAULT_CHRONIC_ABSENCE_THRESHOLD,
+                below_rate: Optional[float] = None) -> Dict[str, Any]:
+        """Per-student rates, absence streaks, chronic-absence flags and lateness trend, in whole-matrix passes.
+
+        attendance_rate counts present sessions only, as the attendance stats
+        do. Streaks count consecutive absent sessions, skipping dates without
+        a record for the class. lateness_trend is the least-squares slope of
+        the late indicator over time, in percentage points per 30 days.
+        """
+        codes = matrix.codes
+        recorded = codes != NOT_RECORDED
+        absent_cells = codes == ABSENT
+        late_cells = codes == LATE
+
+        sessions = recorded.sum(axis=1)
+        present = (codes == PRESENT).sum(axis=1)
+        absent = absent_cells.sum(axis=1)
+        late = late_cells.sum(axis=1)
+        safe_sessions = np.maximum(sessions, 1)
+        attendance_rate = np.round(present / safe_sessions * 100, 2)
+        absence_rate = absent / safe_sessions
+        late_rate = late / safe_sessions
+        chronic = (sessions > 0) & (absence_rate >= chronic_threshold)
+
+        # Absence runs: absences counted so far minus the count at the last recorded non-absent session
+        if codes.shape[1]:
+            absences_so_far = np.cumsum(absent_cells, axis=1, dtype=np.int32)
+            at_last_break = np.maximum.accumulate(np.where(recorded & ~absent_cells, absences_so_far, 0), axis=1)
+            runs = absences_so_far - at_last_break
+            longest_streak = runs.max(axis=1)
+            current_streak = runs[:, -1]
+        else:
+            longest_streak = current_streak = np.zeros(len(matrix.students), dtype=np.int32)
+
+        # Weighted least squares of late (0/1) against day number, over recorded sessions only
+        days = np.array([day.toordinal() for day in matrix.dates], dtype=np.float64)
+        days -= days[0] if len(days) else 0
+        weights = recorded.astype(np.float64)
+        late_values = late_cells.astype(np.float64)
+        sum_x = weights @ days
+        sum_xx = weights @ (days * days)
+        sum_y = late_values.sum(axis=1)
+        sum_xy = late_values @ days
+        denominator = sessions * sum_xx - sum_x * sum_x
+        slope = np.divide(sessions * sum_xy - sum_x * sum_y, denominator,
+                          out=np.zeros(len(matrix.students)), where=denominator > 0)
+        lateness_trend = np.round(slope * 30 * 100, 2)
+
+        selected = np.arange(len(matrix.students))
+        if below_rate is not None:
+            selected = selected[(sessions > 0) & (attendance_rate < below_rate)]
+        # Lowest attendance first
+        selected = selected[np.argsort(attendance_rate[selected], kind="stable")]
+
+        columns = {
+            "sessions": sessions, "present": present, "absent": absent, "late": late,
+            "attendance_rate": attendance_rate, "absence_rate": np.round(absence_rate * 100, 2),
+            "late_rate": np.round(late_rate * 100, 2), "longest_absence_streak": longest_streak,
+            "current_absence_streak": current_streak, "chronic_absence": chronic, "lateness_trend": lateness_trend,
+        }
+        values = {name: column[selected].tolist() for name, column in columns.items()}
+        students = []
+        for position, row in enumerate(selected.tolist()):
+            class_name, student_id, name = matrix.students[row]
+            student = {"student_id": student_id, "name": name, "class_name": class_name}
+            student.update({column: values[column][position] for column in columns})
+            students.append(student)
+
+        return {
+            "date_from": matrix.dates[0] if matrix.dates else None,
+            "date_to": matrix.dates[-1] if matrix.dates else None,
+            "records": matrix.records,
+            "dates": len(matrix.dates),
+            "total_students": len(matrix.students),
+            "chronic_absence_count": int(chronic.sum()),
+            "students": students,
+        }
+
+    @staticmethod
+    async def get_student_analytics(staff_id: Optional[str] = None, class_name: Optional[str] = None,
+                                    date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                    chronic_threshold: float = DEFAULT_CHRONIC_ABSENCE_THRESHOLD,
+                                    below_rate: Optional[float] = None) -> Dict[str, Any]:
+        """Per-student attendance analytics for a staff member and/or class over a date range"""
+        matrix = await AttendanceAnalyticsService.load_matrix(staff_id, class_name, date_from, date_to)
+        return AttendanceAnalyticsService.analyze(matrix, chronic_threshold, below_rate)
+
+    @staticmethod
+    async def get_trend(staff_id: Optional[str] = None, class_name: Optional[str] = None,
+                        granularity: RollupGranularity = RollupGranularity.week,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, Any]:
+        """Attendance trend for one staff member or one class, read from the rollups only"""
+        if bool(staff_id) == bool(class_name):
+            raise InvalidAnalyticsQueryError("Give exactly one of staff_id or class_name")
+        scope, key = ("staff", staff_id) if staff_id else ("class", class_name)
+        points = await AttendanceRollupService.get_trend(scope, key, granularity, date_from, date_to)
+        return {"scope": scope, "key": key, "granularity": granularity.value, "points": points}
@@ -0,0 +1,239 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import logging
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..database import attendance_rollups_collection, attendance_records_collection, DUPLICATE_KEY_ERROR
+from ..models import RollupGranularity
+from .staff_stats_service import ATTENDANCE_TOTALS
+from .dates import from_stored_date, date_range
+from .job_locks import JobLocks, JobLockedError
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ("records",) + ATTENDANCE_TOTALS
+
+# (scope, key, granularity, period start)
+RollupKey = Tuple[str, str, str, str]
+
+REBUILD_BATCH_SIZE = 1000
+REBUILD_LOCK = "attendance_rollups.rebuild"
+# Rollup scopes and the record field each one is keyed by
+SCOPE_FIELDS = {"staff": "staff_id", "class": "class_name"}
+
+def _to_date(value: Any) -> Optional[date]:
+    try:
+        return from_stored_date(value)
+    except (TypeError, ValueError):
+        return None
+
+def period_start(day: date, granularity: str) -> str:
+    """First day of the day / ISO week (Monday) / month containing `day`"""
+    if granularity == RollupGranularity.week.value:
+        day = day - timedelta(days=day.weekday())
+    elif granularity == RollupGranularity.month.value:
+        day = day.replace(day=1)
+    return day.isoformat()
+
+def _rollup_keys(record: Dict[str, Any], scopes: Tuple[str, ...] = tuple(SCOPE_FIELDS)) -> List[RollupKey]:
+    day = _to_date(record.get("date"))
+    if day is None:
+        logger.warning(f"Attendance record {record.get('id')} has no usable date ({record.get('date')!r}); not rolled up")
+        return []
+    keys = []
+    for scope in scopes:
+        key = record[SCOPE_FIELDS[scope]]
+        for granularity in RollupGranularity:
+            keys.append((scope, key, granularity.value, period_start(day, granularity.value)))
+    return keys
+
+def _add(deltas: Dict[RollupKey, Dict[str, int]], record: Optional[Dict[str, Any]], sign: int,
+         scopes: Tuple[str, ...] = tuple(SCOPE_FIELDS)):
+    if not record:
+        return
+    for rollup_key in _rollup_keys(record, scopes):
+        delta = deltas.setdefault(rollup_key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        delta["records"] += sign
+        for field in ATTENDANCE_TOTALS:
+            delta[field] += sign * record.get(field, 0)
+
+class AttendanceRollupService:
+    """Attendance totals per staff member and per class, by day, ISO week and month.
+
+    Kept in step with $inc deltas by the same writes that maintain the staff
+    stats counters, so a trend chart reads one small document per period
+    however many records the period holds. rebuild() recomputes them from
+    the records.
+    """
+
+    @staticmethod
+    async def _apply(deltas: Dict[RollupKey, Dict[str, int]]):
+        now = datetime.utcnow()
+        operations = []
+        for (scope, key, granularity, period), delta in deltas.items():
+            delta = {field: value for field, value in delta.items() if value}
+            if not delta:
+                continue
+            operations.append(UpdateOne(
+                {"scope": scope, "key": key, "granularity": granularity, "period": period},
+                {"$inc": delta, "$set": {"updated_at": now}},
+                upsert=True
+            ))
+        if operations:
+            await attendance_rollups_collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def apply_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply an attendance record going from `before` to `after` (None for create/delete)"""
+        deltas: Dict[RollupKey, Dict[str, int]] = {}
+        _add(deltas, before, -1)
+        _add(deltas, after, 1)
+        await AttendanceRollupService._apply(deltas)
+
+    @staticmethod
+    async def apply_inserted(records: List[Dict[str, Any]]):
+        """Roll up a batch of newly inserted records with one bulk write"""
+        deltas: Dict[RollupKey, Dict[str, int]] = {}
+        for record in records:
+            _add(deltas, record, 1)
+        await AttendanceRollupService._apply(deltas)
+
+    @staticmethod
+    async def get_trend(scope: str, key: str, granularity: RollupGranularity,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """One point per period with records, oldest first.
+
+        Read from the rollups only once a rebuild has completed; until then
+        they may be missing or partial, so the scope's records are rolled up
+        here instead.
+        """
+        # Include the period the range starts in
+        first_period = period_start(date_from, granularity.value) if date_from else None
+        if not await JobLocks.completed(REBUILD_LOCK):
+            documents = await AttendanceRollupService._from_records(scope, key, granularity, first_period, date_to)
+        else:
+            query: Dict[str, Any] = {"scope": scope, "key": key, "granularity": granularity.value}
+            if date_from or date_to:
+                query["period"] = {}
+                if first_period:
+                    query["period"]["$gte"] = first_period
+                if date_to:
+                    query["period"]["$lte"] = date_to.isoformat()
+            projection = {"_id": 0, "period": 1, **{field: 1 for field in ROLLUP_FIELDS}}
+            documents = await attendance_rollups_collection.find(query, projection).sort("period", 1).to_list(None)
+        points = []
+        for document in documents:
+            if not document.get("records"):
+                continue
+            total_students = document.get("total_students", 0)
+            present = document.get("present", 0)
+            points.append({
+                "period": document["period"],
+                **{field: document.get(field, 0) for field in ROLLUP_FIELDS},
+                "attendance_rate": round(present / total_students * 100, 2) if total_students else 0
+            })
+        return points
+
+    @staticmethod
+    async def _from_records(scope: str, key: str, granularity: RollupGranularity,
+                            first_period: Optional[str], date_to: Optional[date]) -> List[Dict[str, Any]]:
+        """The rollups get_trend would read, computed from the scope's records, oldest first"""
+        query: Dict[str, Any] = {SCOPE_FIELDS[scope]: key}
+        if first_period or date_to:
+            query["date"] = date_range(date.fromisoformat(first_period) if first_period else None, date_to)
+        deltas: Dict[RollupKey, Dict[str, int]] = {}
+        projection = {"_id": 0, "id": 1, "staff_id": 1, "class_name": 1, "date": 1, **{field: 1 for field in ATTENDANCE_TOTALS}}
+        async for record in attendance_records_collection.find(query, projection):
+            _add(deltas, record, 1, (scope,))
+        return sorted(
+            ({"period": rollup_key[3], **totals} for rollup_key, totals in deltas.items() if rollup_key[2] == granularity.value),
+            key=lambda document: document["period"]
+        )
+
+    @staticmethod
+    async def _rebuild_key(scope: str, key: str, dry_run: bool) -> Tuple[int, int]:
+        """Correct one staff member's or class's rollups; returns (drifted, left for the next run)"""
+        snapshot: Dict[RollupKey, Dict[str, Optional[int]]] = {}
+        async for document in attendance_rollups_collection.find({"scope": scope, "key": key}, {"_id": 0}):
+            rollup_key = (scope, key, document["granularity"], document["period"])
+            snapshot[rollup_key] = {field: document.get(field) for field in ROLLUP_FIELDS}
+
+        actual: Dict[RollupKey, Dict[str, int]] = {}
+        projection = {"_id": 0, "id": 1, "staff_id": 1, "class_name": 1, "date": 1, **{field: 1 for field in ATTENDANCE_TOTALS}}
+        async for record in attendance_records_collection.find({SCOPE_FIELDS[scope]: key}, projection):
+            _add(actual, record, 1, (scope,))
+
+        now = datetime.utcnow()
+        operations = []
+        for rollup_key in snapshot.keys() | actual.keys():
+            stored = snapshot.get(rollup_key)
+            values = actual.get(rollup_key, dict.fromkeys(ROLLUP_FIELDS, 0))
+            correction = {field: values[field] - ((stored or {}).get(field) or 0) for field in ROLLUP_FIELDS}
+            correction = {field: value for field, value in correction.items() if value}
+            if not correction:
+                continue
+            identity = {"scope": rollup_key[0], "key": rollup_key[1], "granularity": rollup_key[2], "period": rollup_key[3]}
+            # Only a rollup still holding its snapshot values is corrected; one created meanwhile fails the upsert
+            guard = stored if stored is not None else {"updated_at": {"$exists": False}}
+            operations.append(UpdateOne({**identity, **guard}, {"$inc": correction, "$set": {"updated_at": now}}, upsert=stored is None))
+        if dry_run or not operations:
+            return len(operations), 0
+
+        applied = 0
+        for start in range(0, len(operations), REBUILD_BATCH_SIZE):
+            batch = operations[start:start + REBUILD_BATCH_SIZE]
+            try:
+                result = await attendance_rollups_collection.bulk_write(batch, ordered=False)
+                applied += result.matched_count + result.upserted_count
+            except BulkWriteError as e:
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                    raise
+                applied += e.details["nMatched"] + e.details["nUpserted"]
+        return len(operations), len(operations) - applied
+
+    @staticmethod
+    async def rebuild(dry_run: bool = False) -> int:
+        """Recompute every rollup from the records; returns how many stored rollups were wrong (and fixes them).
+
+        Works through one staff member or class at a time: snapshot its
+        rollups, scan its records, then $inc the difference into each rollup
+        that still holds its snapshot values. Writes carry on applying their
+        own deltas meanwhile; a rollup one of them touches before the
+        correction lands is left for the next run. Holds the rebuild lock
+        unless dry_run, and raises JobLockedError if another run holds it.
+        """
+        owner = None
+        if not dry_run:
+            owner = await JobLocks.acquire(REBUILD_LOCK)
+            if owner is None:
+                raise JobLockedError("The attendance rollups are already being rebuilt")
+        drifted = skipped = 0
+        completed = False
+        try:
+            for scope, field in SCOPE_FIELDS.items():
+                keys = set(await attendance_records_collection.distinct(field))
+                keys.update(await attendance_rollups_collection.distinct("key", {"scope": scope}))
+                for key in sorted(key for key in keys if key is not None):
+                    if owner and not await JobLocks.renew(REBUILD_LOCK, owner):
+                        raise JobLockedError("The attendance rollup rebuild lock expired and was taken over")
+                    key_drifted, key_skipped = await AttendanceRollupService._rebuild_key(scope, key, dry_run)
+                    drifted += key_drifted
+                    skipped += key_skipped
+            completed = True
+        finally:
+            if owner:
+                await JobLocks.release(REBUILD_LOCK, owner, completed)
+        if skipped:
+            logger.warning(f"{skipped} attendance rollup(s) changed during the rebuild and were left for the next run")
+        return drifted
+
+    @staticmethod
+    async def ensure_initialized():
+        """Build the rollups from existing records unless a rebuild has completed before"""
+        if await JobLocks.completed(REBUILD_LOCK):
+            return
+        try:
+            drifted = await AttendanceRollupService.rebuild()
+            logger.info(f"Attendance rollups built ({drifted} corrected)")
+        except JobLockedError:
+            logger.info("Attendance rollups are being built by another worker")
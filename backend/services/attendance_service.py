@@ -1,7 +1,29 @@
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
+from datetime import date, datetime
+from pymongo import ReturnDocument
 from ..database import attendance_records_collection
-from ..models import AttendanceRecord, AttendanceRecordCreate, AttendanceRecordUpdate, Student, AttendanceStatus
+from ..ids import new_id
+from ..models import AttendanceRecord, AttendanceRecordCreate, AttendanceRecordUpdate, AttendanceRecordView, Student, AttendanceStatus, Page, StudentStatusChange, StudentStatusChangeResult, BulkStudentStatusResult
+from .repository import Repository, millisecond_precision
+from .pagination import DEFAULT_PAGE_SIZE
+from .staff_stats_service import StaffStatsService, ATTENDANCE_TOTALS_PROJECTION
+from .roster_service import RosterService, STATUS_CODES, CODE_STATUSES, totals_from_statuses
+from .attendance_rollup_service import AttendanceRollupService
+from .dates import to_stored_date, date_range
+
+# Records are stored against a class roster (see RosterService) and read back with their students joined in
+attendance_repository = Repository(attendance_records_collection, AttendanceRecord, expand=RosterService.expand)
+attendance_view_repository = Repository(attendance_records_collection, AttendanceRecordView, expand=RosterService.expand)
+
+# Newest first; id breaks ties between records on the same date
+STAFF_LISTING_SORT = [("date", -1), ("id", -1)]
+
+# What the list screen shows: everything except the per-student array
+SUMMARY_FIELDS = ["id", "class_name", "date", "total_students", "present", "absent", "late", "staff_id", "created_at", "updated_at"]
+
+class InvalidFieldSelectionError(ValueError):
+    """Raised when a `fields` selection names fields an attendance record does not have"""
 
 class AttendanceService:
     
@@ -21,53 +43,78 @@ class AttendanceService:
         }
     
     @staticmethod
-    async def create_attendance_record(attendance_data: AttendanceRecordCreate) -> AttendanceRecord:
-        """Create a new attendance record"""
+    def resolve_projection(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Turn a `fields` parameter ("summary" or a comma-separated list) into a Mongo projection"""
+        if not fields:
+            return None
+        if fields == "summary":
+            selected = SUMMARY_FIELDS
+        else:
+            selected = [name.strip() for name in fields.split(",") if name.strip()]
+            unknown = [name for name in selected if name not in AttendanceRecord.model_fields]
+            if unknown:
+                raise InvalidFieldSelectionError(f"Unknown attendance record fields: {', '.join(unknown)}")
+        projection = {name: 1 for name in selected}
+        if "students" in projection:
+            # Students are stored as a roster reference plus packed statuses
+            projection.update({"roster_id": 1, "statuses": 1})
+        projection.update({"id": 1, "_id": 0})
+        return projection
+    
+    @staticmethod
+    def build_document(attendance_data: AttendanceRecordCreate) -> dict:
+        """Build a new attendance record document, totals included, with its students embedded.
+
+        RosterService.compact turns it into the stored form.
+        """
         students = [Student(**student.dict()) for student in attendance_data.students]
         totals = AttendanceService._calculate_totals(students)
         
         record_dict = attendance_data.dict()
-        record_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        record_dict["id"] = new_id()
+        record_dict["date"] = to_stored_date(attendance_data.date)
         record_dict["students"] = [student.dict() for student in students]
         record_dict.update(totals)
         record_dict["created_at"] = datetime.utcnow()
         record_dict["updated_at"] = datetime.utcnow()
-        
-        result = await attendance_records_collection.insert_one(record_dict)
-        
-        created_record = await attendance_records_collection.find_one({"_id": result.inserted_id})
-        created_record.pop("_id", None)
-        
-        return AttendanceRecord(**created_record)
+        return record_dict
+    
+    @staticmethod
+    async def create_attendance_record(attendance_data: AttendanceRecordCreate) -> AttendanceRecord:
+        """Create a new attendance record"""
+        record_dict = await RosterService.compact(AttendanceService.build_document(attendance_data))
+        record = await attendance_repository.insert(record_dict)
+        await StaffStatsService.apply_attendance_change(None, record_dict)
+        await AttendanceRollupService.apply_change(None, record_dict)
+        return record
     
     @staticmethod
     async def get_attendance_record(record_id: str) -> Optional[AttendanceRecord]:
         """Get attendance record by ID"""
-        record = await attendance_records_collection.find_one({"id": record_id})
-        if record:
-            record.pop("_id", None)
-            return AttendanceRecord(**record)
-        return None
+        return await attendance_repository.get(record_id)
     
     @staticmethod
-    async def get_attendance_records_by_staff(staff_id: str) -> List[AttendanceRecord]:
-        """Get all attendance records for a staff member"""
-        records = []
-        cursor = attendance_records_collection.find({"staff_id": staff_id}).sort("date", -1)
-        async for record in cursor:
-            record.pop("_id", None)
-            records.append(AttendanceRecord(**record))
-        return records
+    async def get_attendance_records_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, projection: Optional[Dict[str, Any]] = None,
+                                              date_from: Optional[date] = None, date_to: Optional[date] = None, trusted: bool = False) -> Page[AttendanceRecordView]:
+        """Get a page of attendance records for a staff member, newest first, optionally within a date range.
+        
+        A range is one bounded scan of the staff_date_id index, however many
+        days it spans. trusted=True returns raw response-shaped items.
+        """
+        query: Dict[str, Any] = {"staff_id": staff_id}
+        if date_from or date_to:
+            query["date"] = date_range(date_from, date_to)
+        if projection is None:
+            return await attendance_repository.paginate(query, STAFF_LISTING_SORT, limit, after, trusted=trusted)
+        return await attendance_view_repository.paginate(query, STAFF_LISTING_SORT, limit, after, projection, trusted=trusted)
     
     @staticmethod
-    async def get_attendance_records_by_date(staff_id: str, date: str) -> List[AttendanceRecord]:
-        """Get attendance records for a specific date"""
-        records = []
-        cursor = attendance_records_collection.find({"staff_id": staff_id, "date": date})
-        async for record in cursor:
-            record.pop("_id", None)
-            records.append(AttendanceRecord(**record))
-        return records
+    async def get_attendance_records_by_date(staff_id: str, date: date, projection: Optional[Dict[str, Any]] = None, trusted: bool = False) -> List[AttendanceRecordView]:
+        """Get attendance records for a specific date; trusted=True returns raw response-shaped items"""
+        query = {"staff_id": staff_id, "date": to_stored_date(date)}
+        if projection is None:
+            return await attendance_repository.find(query, trusted=trusted)
+        return await attendance_view_repository.find(query, projection=projection, trusted=trusted)
     
     @staticmethod
     async def update_attendance_record(record_id: str, update_data: AttendanceRecordUpdate) -> Optional[AttendanceRecord]:
@@ -76,77 +123,301 @@ class AttendanceService:
         if not update_dict:
             return await AttendanceService.get_attendance_record(record_id)
         
-        # Recalculate totals if students were updated
+        update = {}
+        # Recalculate totals and re-resolve the roster if students were updated
         if "students" in update_dict:
             students = [Student(**student) if isinstance(student, dict) else student for student in update_dict["students"]]
-            totals = AttendanceService._calculate_totals(students)
-            update_dict.update(totals)
-            update_dict["students"] = [student.dict() if hasattr(student, 'dict') else student for student in students]
+            current = await attendance_records_collection.find_one({"id": record_id}, {"_id": 0, "staff_id": 1, "class_name": 1})
+            if not current:
+                return None
+            compacted = await RosterService.compact({
+                "staff_id": current["staff_id"],
+                "class_name": update_dict.get("class_name", current["class_name"]),
+                "students": [student.dict() for student in students]
+            })
+            update_dict.pop("students")
+            update_dict.update(AttendanceService._calculate_totals(students))
+            update_dict.update(roster_id=compacted["roster_id"], statuses=compacted["statuses"])
+            # Drop the embedded list of a record still in the legacy form
+            update["$unset"] = {"students": ""}
+        if "date" in update_dict:
+            update_dict["date"] = to_stored_date(update_dict["date"])
         
         update_dict["updated_at"] = datetime.utcnow()
+        update["$set"] = update_dict
         
-        result = await attendance_records_collection.update_one(
+        before = await attendance_records_collection.find_one_and_update(
             {"id": record_id},
-            {"$set": update_dict}
+            update,
+            projection=ATTENDANCE_TOTALS_PROJECTION,
+            return_document=ReturnDocument.BEFORE
         )
+        if not before:
+            return None
         
-        if result.modified_count:
-            return await AttendanceService.get_attendance_record(record_id)
-        return None
+        record = await AttendanceService.get_attendance_record(record_id)
+        after = record.dict() if record else None
+        await StaffStatsService.apply_attendance_change(before, after)
+        await AttendanceRollupService.apply_change(before, after)
+        return record
+    
+    @staticmethod
+    def _status_tap(position: int, length: int, status: AttendanceStatus, now: datetime) -> List[Dict[str, Any]]:
+        """Update pipeline that sets the code at `position` and moves the totals off whatever code it held.
+
+        `length` is the roster size, an upper bound for the statuses array.
+        A tap that repeats the current status changes nothing, updated_at
+        included.
+        """
+        code = STATUS_CODES[status.value]
+        previous = {"$arrayElemAt": ["$statuses", position]}
+        totals = {
+            name: {"$add": [f"${name}", {"$cond": [{"$eq": [previous, value]}, -1, 0]}, int(value == code)]}
+            for name, value in STATUS_CODES.items()
+        }
+        return [{"$set": {
+            "statuses": {"$concatArrays": [
+                {"$slice": ["$statuses", position]}, [code], {"$slice": ["$statuses", position + 1, length]}
+            ]},
+            **totals,
+            "updated_at": {"$cond": [{"$eq": [previous, code]}, "$updated_at", now]}
+        }}]
+    
+    @staticmethod
+    async def _tap_roster_record(record_id: str, placements: Dict[str, Tuple[int, int]], status: AttendanceStatus, now: datetime) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Apply a tap to a roster-backed record listing the student; returns its pre-image and the student's position.
+
+        The filter pins the roster versions that hold the student at one
+        position, so one update per distinct position is tried; usually there
+        is just one.
+        """
+        by_position: Dict[int, List[str]] = {}
+        lengths: Dict[int, int] = {}
+        for roster_id, (position, length) in placements.items():
+            by_position.setdefault(position, []).append(roster_id)
+            lengths[position] = max(length, lengths.get(position, 0))
+        for position, roster_ids in by_position.items():
+            before = await attendance_records_collection.find_one_and_update(
+                {"id": record_id, "roster_id": {"$in": roster_ids}, f"statuses.{position}": {"$exists": True}},
+                AttendanceService._status_tap(position, lengths[position], status, now),
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE
+            )
+            if before:
+                return before, position
+        return None, -1
+    
+    @staticmethod
+    async def _tap_legacy_record(record_id: str, student_id: str, status: AttendanceStatus, now: datetime) -> Optional[AttendanceRecord]:
+        """Apply a tap to a record still holding its students embedded.
+
+        The filter pins the student's previous status so the totals move by
+        the right amounts; each candidate previous status is tried in turn.
+        """
+        for previous in AttendanceStatus:
+            if previous == status:
+                continue
+            before = await attendance_records_collection.find_one_and_update(
+                {"id": record_id, "students": {"$elemMatch": {"id": student_id, "status": previous.value}}},
+                {
+                    "$set": {"students.$.status": status.value, "updated_at": now},
+                    "$inc": {previous.value: -1, status.value: 1}
+                },
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE
+            )
+            if before:
+                students = [{**student, "status": status.value} if student["id"] == student_id else student for student in before["students"]]
+                after = {**before, "students": students, previous.value: before[previous.value] - 1, status.value: before[status.value] + 1, "updated_at": now}
+                await StaffStatsService.apply_attendance_change(before, after)
+                await AttendanceRollupService.apply_change(before, after)
+                return attendance_repository.to_model((await attendance_repository.prepare([after]))[0])
+        # No match: the student already has this status, or the record is not a legacy one listing the student
+        return await attendance_repository.find_one({"id": record_id, "students": {"$elemMatch": {"id": student_id, "status": status.value}}})
     
     @staticmethod
     async def update_student_attendance(record_id: str, student_id: str, status: AttendanceStatus) -> Optional[AttendanceRecord]:
-        """Update specific student's attendance status"""
-        record = await AttendanceService.get_attendance_record(record_id)
-        if not record:
+        """Update specific student's attendance status.
+        
+        One find_one_and_update with an update pipeline reads the student's
+        current code on the server, writes the new one and moves the totals
+        to match, so a tap is a single atomic round trip and concurrent taps
+        on other students are never overwritten. The student's position comes
+        from the cached roster versions listing them, so the record is not
+        read first. The pre-image it returns holds the previous code, which
+        the stats and rollup deltas need; the post-image follows from it.
+        Records still in the legacy embedded form are updated in place.
+        """
+        now = millisecond_precision(datetime.utcnow())
+        placements = await RosterService.student_placements(student_id)
+        before, position = await AttendanceService._tap_roster_record(record_id, placements, status, now)
+        if not before:
+            record = await AttendanceService._tap_legacy_record(record_id, student_id, status, now)
+            if record:
+                return record
+            # The record may use a roster version created by another worker
+            refreshed = await RosterService.student_placements(student_id, refresh=True)
+            if refreshed != placements:
+                before, position = await AttendanceService._tap_roster_record(record_id, refreshed, status, now)
+        if not before:
             return None
         
-        # Update student status
-        for student in record.students:
-            if student.id == student_id:
-                student.status = status
-                break
+        previous = CODE_STATUSES[before["statuses"][position]]
+        after = before
+        if previous != status.value:
+            statuses = list(before["statuses"])
+            statuses[position] = STATUS_CODES[status.value]
+            after = {**before, "statuses": statuses, previous: before[previous] - 1, status.value: before[status.value] + 1, "updated_at": now}
+            await StaffStatsService.apply_attendance_change(before, after)
+            await AttendanceRollupService.apply_change(before, after)
+        return attendance_repository.to_model((await attendance_repository.prepare([after]))[0])
+    
+    @staticmethod
+    async def update_student_attendance_bulk(changes: List[StudentStatusChange]) -> BulkStudentStatusResult:
+        """Apply many student status changes across one or more records in one request.
         
-        # Recalculate totals
-        totals = AttendanceService._calculate_totals(record.students)
+        Each affected record is read once, its statuses and totals are
+        recomputed once, and the records are written concurrently, one update
+        each. Every write is guarded by the roster and statuses (or, for a
+        record still in the legacy embedded form, the students) it was
+        computed from, so a record changed by someone else in the meantime is
+        left alone and its changes are reported as conflicts. A write that
+        matched stored exactly what was computed, so the returned records and
+        the stats and rollup deltas come from that, not from a read-back.
+        Later changes to the same student win over earlier ones.
+        """
+        record_ids = list(dict.fromkeys(change.record_id for change in changes))
+        documents = {
+            document["id"]: document
+            async for document in attendance_records_collection.find({"id": {"$in": record_ids}}, {"_id": 0})
+        }
+        rosters = await RosterService.get_rosters([document["roster_id"] for document in documents.values() if document.get("roster_id")])
         
-        result = await attendance_records_collection.update_one(
-            {"id": record_id},
-            {"$set": {
-                "students": [student.dict() for student in record.students],
-                **totals,
-                "updated_at": datetime.utcnow()
-            }}
-        )
+        # Student positions and packed statuses per record; legacy records are packed from their embedded students
+        positions: Dict[str, Dict[str, int]] = {}
+        original: Dict[str, List[int]] = {}
+        for record_id, document in documents.items():
+            if "students" in document:
+                positions[record_id] = {student["id"]: index for index, student in enumerate(document["students"])}
+                original[record_id] = [STATUS_CODES[student["status"]] for student in document["students"]]
+            elif document.get("roster_id") in rosters:
+                positions[record_id] = rosters[document["roster_id"]]["positions"]
+                original[record_id] = document["statuses"]
         
-        if result.modified_count:
-            return await AttendanceService.get_attendance_record(record_id)
-        return None
+        results: List[StudentStatusChangeResult] = []
+        changed: Dict[str, List[StudentStatusChangeResult]] = {}
+        statuses: Dict[str, List[int]] = {}
+        for change in changes:
+            item = StudentStatusChangeResult(**change.dict(), result="updated")
+            results.append(item)
+            document = documents.get(change.record_id)
+            position = positions.get(change.record_id, {}).get(change.student_id)
+            if document is None:
+                item.result = "record_not_found"
+            elif position is None:
+                item.result = "student_not_found"
+            else:
+                record_statuses = statuses.setdefault(change.record_id, list(original[change.record_id]))
+                if record_statuses[position] == STATUS_CODES[change.status.value]:
+                    item.result = "unchanged"
+                else:
+                    record_statuses[position] = STATUS_CODES[change.status.value]
+                    changed.setdefault(change.record_id, []).append(item)
+        
+        if not changed:
+            return BulkStudentStatusResult(results=results, records=[])
+        
+        now = millisecond_precision(datetime.utcnow())
+        afters: Dict[str, Dict[str, Any]] = {}
+        writes = []
+        for record_id in changed:
+            document = documents[record_id]
+            update = {**totals_from_statuses(statuses[record_id]), "updated_at": now}
+            if "students" in document:
+                guard = {"students": document["students"]}
+                update["students"] = [
+                    {**student, "status": CODE_STATUSES[code]} for student, code in zip(document["students"], statuses[record_id])
+                ]
+            else:
+                guard = {"roster_id": document["roster_id"], "statuses": document["statuses"]}
+                update["statuses"] = statuses[record_id]
+            afters[record_id] = {**document, **update}
+            writes.append(attendance_records_collection.update_one({"id": record_id, **guard}, {"$set": update}))
+        write_results = await asyncio.gather(*writes)
+        
+        applied = []
+        for (record_id, items), write_result in zip(changed.items(), write_results):
+            if not write_result.matched_count:
+                for item in items:
+                    item.result = "conflict"
+                continue
+            applied.append(afters[record_id])
+            await StaffStatsService.apply_attendance_change(documents[record_id], afters[record_id])
+            await AttendanceRollupService.apply_change(documents[record_id], afters[record_id])
+        
+        records = [attendance_repository.to_model(document) for document in await attendance_repository.prepare(applied)]
+        return BulkStudentStatusResult(results=results, records=records)
     
     @staticmethod
     async def delete_attendance_record(record_id: str) -> bool:
         """Delete attendance record"""
-        result = await attendance_records_collection.delete_one({"id": record_id})
-        return result.deleted_count > 0
+        deleted = await attendance_records_collection.find_one_and_delete(
+            {"id": record_id},
+            projection=ATTENDANCE_TOTALS_PROJECTION
+        )
+        if not deleted:
+            return False
+        await StaffStatsService.apply_attendance_change(deleted, None)
+        await AttendanceRollupService.apply_change(deleted, None)
+        return True
     
     @staticmethod
-    async def get_attendance_stats(staff_id: str) -> dict:
-        """Get attendance statistics"""
-        records = await AttendanceService.get_attendance_records_by_staff(staff_id)
+    async def get_attendance_stats(staff_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None, class_name: Optional[str] = None) -> dict:
+        """Get attendance statistics, optionally limited to a date range and class"""
+        if not (date_from or date_to or class_name):
+            # All-time totals are kept as counters, so no scan is needed
+            counters = (await StaffStatsService.get_counters(staff_id))["attendance"]
+            return AttendanceService._stats_from_totals({
+                "total_records": counters["records"],
+                "total_students_tracked": counters["total_students"],
+                "total_present": counters["present"],
+                "total_absent": counters["absent"],
+                "total_late": counters["late"]
+            })
         
-        total_records = len(records)
-        total_students = sum(record.total_students for record in records)
-        total_present = sum(record.present for record in records)
-        total_absent = sum(record.absent for record in records)
-        total_late = sum(record.late for record in records)
+        match: Dict[str, Any] = {"staff_id": staff_id}
+        if date_from or date_to:
+            match["date"] = date_range(date_from, date_to)
+        if class_name:
+            match["class_name"] = class_name
         
+        # Only the totals are projected, so the staff_date_totals index covers the whole scan
+        pipeline = [
+            {"$match": match},
+            {"$project": {"_id": 0, "total_students": 1, "present": 1, "absent": 1, "late": 1}},
+            {"$group": {
+                "_id": None,
+                "total_records": {"$sum": 1},
+                "total_students_tracked": {"$sum": "$total_students"},
+                "total_present": {"$sum": "$present"},
+                "total_absent": {"$sum": "$absent"},
+                "total_late": {"$sum": "$late"}
+            }}
+        ]
+        results = await attendance_records_collection.aggregate(pipeline).to_list(1)
+        return AttendanceService._stats_from_totals(results[0] if results else {})
+    
+    @staticmethod
+    def _stats_from_totals(totals: Dict[str, int]) -> dict:
+        total_students = totals.get("total_students_tracked", 0)
+        total_present = totals.get("total_present", 0)
         attendance_rate = (total_present / total_students * 100) if total_students > 0 else 0
         
         return {
-            "total_records": total_records,
+            "total_records": totals.get("total_records", 0),
             "total_students_tracked": total_students,
             "total_present": total_present,
-            "total_absent": total_absent,
-            "total_late": total_late,
+            "total_absent": totals.get("total_absent", 0),
+            "total_late": totals.get("total_late", 0),
             "attendance_rate": round(attendance_rate, 2)
         }
\ No newline at end of file
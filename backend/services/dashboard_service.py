@@ -1,9 +1,63 @@
-from typing import List, Optional
+from typing import Any, Awaitable, Dict, List, Optional
 from datetime import datetime, date
-from ..database import tasks_collection, activities_collection, announcements_collection
-from ..models import Task, TaskCreate, Activity, ActivityCreate, Announcement, AnnouncementCreate, DashboardData
+import os
+import time
+import asyncio
+import logging
+from pymongo import ReturnDocument
+from ..database import tasks_collection, announcements_collection
+from ..ids import new_id
+from ..models import Task, TaskCreate, Activity, ActivityCreate, ActivityRollup, Announcement, AnnouncementCreate, DashboardData, Page
 from .schedule_service import ScheduleService
-from .attendance_service import AttendanceService
+from .staff_stats_service import StaffStatsService
+from .repository import Repository
+from .pagination import DEFAULT_PAGE_SIZE
+from .cache import LRUTTLCache
+from .activity_writer import ActivityWriter
+from .activity_store import ActivityStore
+from .dates import to_stored_date, date_range
+
+task_repository = Repository(tasks_collection, Task)
+announcement_repository = Repository(announcements_collection, Announcement)
+
+# Soonest due first; id breaks ties between tasks due the same day
+TASK_LISTING_SORT = [("due_date", 1), ("id", 1)]
+
+logger = logging.getLogger(__name__)
+
+# Time budget (seconds) for each dashboard section; a section that misses it is served degraded
+_DEFAULT_SECTION_TIMEOUT = float(os.environ.get("DASHBOARD_SECTION_TIMEOUT_MS", "800")) / 1000
+SECTION_TIMEOUTS: Dict[str, float] = {
+    "today_schedule": _DEFAULT_SECTION_TIMEOUT,
+    "upcoming_tasks": _DEFAULT_SECTION_TIMEOUT,
+    "recent_activities": _DEFAULT_SECTION_TIMEOUT,
+    "announcements": _DEFAULT_SECTION_TIMEOUT,
+    "staff_stats": _DEFAULT_SECTION_TIMEOUT,
+}
+
+# Per-staff dashboard snapshots, plus one shared entry for the global announcements section
+dashboard_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("DASHBOARD_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "300"))
+)
+ANNOUNCEMENTS_CACHE_KEY = "announcements"
+
+async def _write_activity_batch(documents: List[Dict[str, Any]]):
+    await ActivityStore.append(documents)
+    for staff_id in {document["staff_id"] for document in documents}:
+        DashboardService.invalidate_staff(staff_id)
+
+# Activities logged by routes are written behind the request, in batches
+activity_writer = ActivityWriter(
+    _write_activity_batch,
+    max_queue_size=int(os.environ.get("ACTIVITY_QUEUE_MAX_SIZE", "10000")),
+    batch_size=int(os.environ.get("ACTIVITY_FLUSH_BATCH_SIZE", "200")),
+    flush_interval=float(os.environ.get("ACTIVITY_FLUSH_INTERVAL_MS", "250")) / 1000
+)
+
+def _staff_cache_key(staff_id: str) -> tuple:
+    # Today's schedule and upcoming tasks depend on the date, so snapshots never outlive it
+    return ("staff", staff_id, date.today().isoformat())
 
 class DashboardService:
     
@@ -11,135 +65,121 @@ class DashboardService:
     async def create_task(task_data: TaskCreate) -> Task:
         """Create a new task"""
         task_dict = task_data.dict()
-        task_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        task_dict["id"] = new_id()
+        task_dict["due_date"] = to_stored_date(task_data.due_date)
+        # Stored explicitly so the upcoming-tasks query (completed: False) matches it
+        task_dict["completed"] = False
         task_dict["created_at"] = datetime.utcnow()
         
-        result = await tasks_collection.insert_one(task_dict)
-        
-        created_task = await tasks_collection.find_one({"_id": result.inserted_id})
-        created_task.pop("_id", None)
-        
-        return Task(**created_task)
+        return await task_repository.insert(task_dict)
     
     @staticmethod
-    async def get_tasks_by_staff(staff_id: str) -> List[Task]:
-        """Get all tasks for a staff member"""
-        tasks = []
-        cursor = tasks_collection.find({"staff_id": staff_id}).sort("due_date", 1)
-        async for task in cursor:
-            task.pop("_id", None)
-            tasks.append(Task(**task))
-        return tasks
+    async def get_tasks_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                                 due_from: Optional[date] = None, due_to: Optional[date] = None) -> Page[Task]:
+        """Get a page of tasks for a staff member, soonest due first, optionally due within a date range"""
+        query: Dict[str, Any] = {"staff_id": staff_id}
+        if due_from or due_to:
+            query["due_date"] = date_range(due_from, due_to)
+        return await task_repository.paginate(query, TASK_LISTING_SORT, limit, after)
     
     @staticmethod
     async def get_upcoming_tasks(staff_id: str, limit: int = 10) -> List[Task]:
         """Get upcoming tasks for a staff member"""
-        tasks = []
-        today = date.today().isoformat()
-        cursor = tasks_collection.find({
+        return await task_repository.find({
             "staff_id": staff_id, 
             "completed": False,
-            "due_date": {"$gte": today}
-        }).sort("due_date", 1).limit(limit)
-        
-        async for task in cursor:
-            task.pop("_id", None)
-            tasks.append(Task(**task))
-        return tasks
+            "due_date": {"$gte": to_stored_date(date.today())}
+        }, sort=[("due_date", 1)], limit=limit)
     
     @staticmethod
     async def complete_task(task_id: str) -> Optional[Task]:
         """Mark task as completed"""
-        result = await tasks_collection.update_one(
-            {"id": task_id},
-            {"$set": {"completed": True}}
+        # Only the call that flips the flag counts the completion
+        document = await tasks_collection.find_one_and_update(
+            {"id": task_id, "completed": {"$ne": True}},
+            {"$set": {"completed": True}},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count:
-            task = await tasks_collection.find_one({"id": task_id})
-            task.pop("_id", None)
-            return Task(**task)
+        if document:
+            await StaffStatsService.apply_task_completed(document["staff_id"])
+            return task_repository.to_model(document)
         return None
     
     @staticmethod
     async def create_activity(activity_data: ActivityCreate) -> Activity:
         """Create a new activity"""
         activity_dict = activity_data.dict()
-        activity_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        activity_dict["id"] = new_id()
         activity_dict["created_at"] = datetime.utcnow()
         
-        result = await activities_collection.insert_one(activity_dict)
-        
-        created_activity = await activities_collection.find_one({"_id": result.inserted_id})
-        created_activity.pop("_id", None)
-        
-        return Activity(**created_activity)
+        await ActivityStore.append([activity_dict])
+        DashboardService.invalidate_staff(activity_data.staff_id)
+        return Activity(**activity_dict)
     
     @staticmethod
     async def get_recent_activities_by_staff(staff_id: str, limit: int = 10) -> List[Activity]:
         """Get recent activities for a staff member"""
-        activities = []
-        cursor = activities_collection.find({"staff_id": staff_id}).sort("created_at", -1).limit(limit)
-        async for activity in cursor:
-            activity.pop("_id", None)
-            activities.append(Activity(**activity))
-        return activities
+        return await ActivityStore.recent(staff_id, limit)
+    
+    @staticmethod
+    async def get_activity_rollups(staff_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[ActivityRollup]:
+        """Get daily activity counts per type for a staff member"""
+        return await ActivityStore.rollups(staff_id, date_from, date_to)
     
     @staticmethod
     async def create_announcement(announcement_data: AnnouncementCreate) -> Announcement:
         """Create a new announcement"""
         announcement_dict = announcement_data.dict()
-        announcement_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        announcement_dict["id"] = new_id()
         announcement_dict["created_at"] = datetime.utcnow()
         
-        result = await announcements_collection.insert_one(announcement_dict)
-        
-        created_announcement = await announcements_collection.find_one({"_id": result.inserted_id})
-        created_announcement.pop("_id", None)
-        
-        return Announcement(**created_announcement)
+        return await announcement_repository.insert(announcement_dict)
     
     @staticmethod
     async def get_recent_announcements(limit: int = 10) -> List[Announcement]:
         """Get recent announcements"""
-        announcements = []
-        cursor = announcements_collection.find({}).sort("created_at", -1).limit(limit)
-        async for announcement in cursor:
-            announcement.pop("_id", None)
-            announcements.append(Announcement(**announcement))
-        return announcements
+        return await announcement_repository.find({}, sort=[("created_at", -1)], limit=limit)
     
     @staticmethod
-    async def get_dashboard_data(staff_id: str) -> DashboardData:
-        """Get comprehensive dashboard data for a staff member"""
-        
-        # Get today's schedule
+    async def _load_section(name: str, loader: Awaitable, fallback: Any, timings: Dict[str, float], degraded: List[str]) -> Any:
+        """Await one dashboard section within its time budget, falling back if it is slow or fails"""
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(loader, SECTION_TIMEOUTS[name])
+        except asyncio.TimeoutError:
+            logger.warning(f"Dashboard section '{name}' exceeded {SECTION_TIMEOUTS[name] * 1000:.0f}ms")
+        except Exception as e:
+            logger.warning(f"Dashboard section '{name}' failed: {e}")
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
+        degraded.append(name)
+        return fallback
+    
+    @staticmethod
+    async def _build_staff_snapshot(staff_id: str, timings: Dict[str, float]) -> DashboardData:
+        """Fetch the per-staff dashboard sections concurrently; announcements are left empty"""
+        degraded: List[str] = []
         today = datetime.now().strftime('%A')  # Monday, Tuesday, etc.
-        today_schedule = await ScheduleService.get_schedules_by_day(staff_id, today)
         
-        # Get upcoming tasks
-        upcoming_tasks = await DashboardService.get_upcoming_tasks(staff_id, 4)
-        
-        # Get recent activities
-        recent_activities = await DashboardService.get_recent_activities_by_staff(staff_id, 3)
-        
-        # Get announcements
-        announcements = await DashboardService.get_recent_announcements(2)
-        
-        # Get statistics
-        schedule_stats = await ScheduleService.get_schedule_stats(staff_id)
-        attendance_stats = await AttendanceService.get_attendance_stats(staff_id)
-        
-        # Calculate completed tasks count
-        completed_tasks_count = await tasks_collection.count_documents({
-            "staff_id": staff_id,
-            "completed": True
-        })
+        load = DashboardService._load_section
+        (
+            today_schedule,
+            upcoming_tasks,
+            recent_activities,
+            staff_counters
+        ) = await asyncio.gather(
+            load("today_schedule", ScheduleService.get_schedules_by_day(staff_id, today), [], timings, degraded),
+            load("upcoming_tasks", DashboardService.get_upcoming_tasks(staff_id, 4), [], timings, degraded),
+            load("recent_activities", DashboardService.get_recent_activities_by_staff(staff_id, 3), [], timings, degraded),
+            load("staff_stats", StaffStatsService.get_counters(staff_id), None, timings, degraded)
+        )
         
+        staff_counters = staff_counters or {"attendance": {"total_students": 0}, "tasks": {"completed": 0}}
         stats = {
             "today_classes": len(today_schedule),
-            "completed_tasks": completed_tasks_count,
-            "total_students": attendance_stats.get("total_students_tracked", 156),  # Default fallback
+            "completed_tasks": staff_counters["tasks"]["completed"],
+            "total_students": staff_counters["attendance"]["total_students"],
             "pending_tasks": len(upcoming_tasks)
         }
         
@@ -147,15 +187,78 @@ class DashboardService:
             today_schedule=today_schedule,
             upcoming_tasks=upcoming_tasks,
             recent_activities=recent_activities,
-            announcements=announcements,
-            stats=stats
+            announcements=[],
+            stats=stats,
+            degraded_sections=degraded
         )
     
     @staticmethod
-    async def log_activity(staff_id: str, activity_description: str):
-        """Log an activity for a staff member"""
+    async def get_dashboard_data(staff_id: str, timings: Optional[Dict[str, float]] = None) -> DashboardData:
+        """Get comprehensive dashboard data for a staff member.
+        
+        The per-staff sections and the global announcements section are cached
+        separately and refetched concurrently on a miss. Any section that
+        misses its budget or raises is returned empty, listed in
+        degraded_sections and not cached; per-section durations (ms) are
+        written to `timings` when given.
+        """
+        timings = {} if timings is None else timings
+        token = dashboard_cache.begin()
+        staff_key = _staff_cache_key(staff_id)
+        snapshot = dashboard_cache.get(staff_key)
+        announcements = dashboard_cache.get(ANNOUNCEMENTS_CACHE_KEY)
+        announcements_degraded: List[str] = []
+        
+        pending = {}
+        if snapshot is None:
+            pending["snapshot"] = DashboardService._build_staff_snapshot(staff_id, timings)
+        if announcements is None:
+            pending["announcements"] = DashboardService._load_section(
+                "announcements", DashboardService.get_recent_announcements(2), [], timings, announcements_degraded
+            )
+        if pending:
+            results = dict(zip(pending, await asyncio.gather(*pending.values())))
+            if "snapshot" in results:
+                snapshot = results["snapshot"]
+                if not snapshot.degraded_sections:
+                    dashboard_cache.set(staff_key, snapshot, token)
+            if "announcements" in results:
+                announcements = results["announcements"]
+                if not announcements_degraded:
+                    dashboard_cache.set(ANNOUNCEMENTS_CACHE_KEY, announcements, token)
+        
+        return snapshot.copy(update={
+            "announcements": announcements,
+            "degraded_sections": snapshot.degraded_sections + announcements_degraded
+        })
+    
+    @staticmethod
+    def invalidate_staff(staff_id: str):
+        """Drop a staff member's cached dashboard after a write that changes it"""
+        dashboard_cache.invalidate(_staff_cache_key(staff_id))
+    
+    @staticmethod
+    def invalidate_announcements():
+        """Drop the cached announcements section shared by every dashboard"""
+        dashboard_cache.invalidate(ANNOUNCEMENTS_CACHE_KEY)
+    
+    @staticmethod
+    async def log_activity(staff_id: str, activity_description: str, activity_type: str = "general"):
+        """Log an activity for a staff member.
+        
+        While the activity writer is running the entry is only queued, so the
+        caller does not wait on the database; otherwise (scripts, jobs) it is
+        written directly.
+        """
         activity_data = ActivityCreate(
             activity=activity_description,
+            type=activity_type,
             staff_id=staff_id
         )
-        await DashboardService.create_activity(activity_data)
\ No newline at end of file
+        if not activity_writer.running:
+            await DashboardService.create_activity(activity_data)
+            return
+        activity_dict = activity_data.dict()
+        activity_dict["id"] = new_id()
+        activity_dict["created_at"] = datetime.utcnow()
+        activity_writer.enqueue(activity_dict)
\ No newline at end of file
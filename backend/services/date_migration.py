@@ -0,0 +1,108 @@
+from typing import Any, Dict, List, Tuple
+import asyncio
+import logging
+from pymongo import UpdateOne
+from ..database import attendance_records_collection, tasks_collection
+from .dates import parse_date, to_stored_date
+from .job_locks import JobLocks, JobLockedError
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = "native_dates.migrate"
+MIGRATION_BATCH_SIZE = 500
+# How often a worker waiting for another one's migration checks whether it has finished
+MIGRATION_POLL_SECONDS = 2.0
+# Listed per collection; the rest are only counted
+MAX_REPORTED_INVALID = 20
+
+# (collection, date field) pairs that used to hold YYYY-MM-DD strings
+DATE_FIELDS = ((attendance_records_collection, "date"), (tasks_collection, "due_date"))
+
+class NativeDateMigration:
+    """Converts calendar dates stored as strings to the stored date form (see services.dates).
+
+    Until a collection is converted, range queries, the date-bounded listings
+    and upcoming tasks miss its string-dated documents, so every worker runs
+    the conversion before it starts serving; the first one does the work
+    under a lock and the rest wait for its completion marker.
+    """
+
+    @staticmethod
+    async def _migrate(collection, field: str, batch_size: int, dry_run: bool, renew) -> Dict[str, Any]:
+        converted = skipped = 0
+        invalid: List[Tuple[str, Any]] = []
+        operations = []
+
+        async def flush():
+            nonlocal converted, skipped
+            if operations and not dry_run:
+                if not await renew():
+                    raise JobLockedError("The date migration lock expired and was taken over")
+                result = await collection.bulk_write(operations, ordered=False)
+                converted += result.modified_count
+                skipped += len(operations) - result.modified_count
+            elif operations:
+                converted += len(operations)
+            operations.clear()
+
+        cursor = collection.find({field: {"$type": "string"}}, {"_id": 0, "id": 1, field: 1}).batch_size(batch_size)
+        async for document in cursor:
+            value = document[field]
+            try:
+                stored = to_stored_date(parse_date(value))
+            except ValueError:
+                invalid.append((document["id"], value))
+                continue
+            # Matching the old value leaves documents rewritten since they were read alone
+            operations.append(UpdateOne({"id": document["id"], field: value}, {"$set": {field: stored}}))
+            if len(operations) >= batch_size:
+                await flush()
+        await flush()
+        return {"collection": collection.name, "field": field, "converted": converted, "skipped": skipped, "invalid": invalid}
+
+    @staticmethod
+    async def migrate(batch_size: int = MIGRATION_BATCH_SIZE, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Convert every date field in DATE_FIELDS; one result per field.
+
+        Values parse_date cannot read are left as they are and listed under
+        "invalid"; a document changed while this runs is skipped and picked up
+        by the next run. Holds the migration lock unless dry_run, and raises
+        JobLockedError if another run holds it.
+        """
+        if dry_run:
+            async def renew():
+                return True
+            return [await NativeDateMigration._migrate(collection, field, batch_size, True, renew) for collection, field in DATE_FIELDS]
+
+        owner = await JobLocks.acquire(MIGRATION_LOCK)
+        if owner is None:
+            raise JobLockedError("The date migration is already running")
+
+        async def renew():
+            return await JobLocks.renew(MIGRATION_LOCK, owner)
+
+        completed = False
+        try:
+            results = [await NativeDateMigration._migrate(collection, field, batch_size, False, renew) for collection, field in DATE_FIELDS]
+            completed = True
+        finally:
+            await JobLocks.release(MIGRATION_LOCK, owner, completed)
+        return results
+
+    @staticmethod
+    async def ensure_migrated():
+        """Return once the dates have been converted, converting them here unless another worker is"""
+        while not await JobLocks.completed(MIGRATION_LOCK):
+            try:
+                results = await NativeDateMigration.migrate()
+            except JobLockedError:
+                logger.info("Waiting for another worker to finish converting dates")
+                await asyncio.sleep(MIGRATION_POLL_SECONDS)
+                continue
+            for result in results:
+                logger.info(f"{result['collection']}.{result['field']}: converted {result['converted']} string date(s)")
+                if result["invalid"]:
+                    logger.warning(
+                        f"{result['collection']}.{result['field']}: {len(result['invalid'])} value(s) are not dates and were left as stored, "
+                        f"e.g. {result['invalid'][:MAX_REPORTED_INVALID]}"
+                    )
@@ -0,0 +1,55 @@
+from datetime import date, datetime, time
+from typing import Any, Dict, Optional
+
+# BSON has no date-only type, so calendar dates (attendance dates, task due
+# dates) are stored as UTC midnight datetimes: they compare, sort and index as
+# dates, while the API keeps reading and writing YYYY-MM-DD.
+
+# Other formats clients sent while dates were plain strings. All-numeric dates
+# are read day first unless that cannot be a date (01/15/2025)
+DATE_FORMATS = (
+    "%Y/%m/%d", "%Y.%m.%d",
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%m/%d/%Y", "%m-%d-%Y",
+    "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y",
+)
+
+def parse_date(value: str) -> date:
+    """Calendar date of a YYYY-MM-DD string, an ISO datetime or one of DATE_FORMATS"""
+    text = value.strip()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"{value!r} is not a date; use YYYY-MM-DD")
+
+def to_stored_date(value: date) -> datetime:
+    """Stored form of a calendar date"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, time.min)
+
+def from_stored_date(value: Any) -> date:
+    """Calendar date of a stored value; strings from before the date migration are parsed with parse_date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return parse_date(value)
+
+def date_range(date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, datetime]:
+    """Inclusive range condition on a stored date field; empty when neither bound is given"""
+    condition = {}
+    if date_from:
+        condition["$gte"] = to_stored_date(date_from)
+    if date_to:
+        condition["$lte"] = to_stored_date(date_to)
+    return condition
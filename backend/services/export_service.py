@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from datetime import date, datetime, time, timedelta
+from ..database import attendance_records_collection, form_submissions_collection
+from .roster_service import RosterService
+from .dates import date_range
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per cursor round trip, and bytes buffered before a chunk is sent
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+ATTENDANCE_CSV_COLUMNS = ["record_id", "class_name", "date", "staff_id", "student_id", "student_name", "status"]
+SUBMISSION_CSV_COLUMNS = ["id", "template_id", "template_name", "status", "staff_id", "created_at", "updated_at", "data"]
+
+class InvalidExportError(ValueError):
+    """Raised when export parameters are invalid"""
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _csv_line(values: Iterable[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([_csv_value(value) for value in values])
+    return buffer.getvalue()
+
+async def _encode(lines: AsyncIterator[str], compress: bool) -> AsyncIterator[bytes]:
+    """Group lines into ~EXPORT_CHUNK_BYTES chunks, gzip-compressing incrementally when asked"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    pending: List[bytes] = []
+    pending_size = 0
+    async for line in lines:
+        data = line.encode()
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= EXPORT_CHUNK_BYTES:
+            chunk = b"".join(pending)
+            pending, pending_size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(pending)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+class ExportService:
+    """Constant-memory exports streamed straight from a Mongo cursor.
+
+    Documents are read EXPORT_BATCH_SIZE at a time and written out as they
+    arrive, so only one batch and one output chunk are held in memory however
+    large the export is.
+    """
+
+    @staticmethod
+    def _check_format(file_format: str):
+        if file_format not in EXPORT_FORMATS:
+            raise InvalidExportError(f"Unsupported export format: {file_format}")
+
+    @staticmethod
+    def _cursor(collection, query: Dict[str, Any], sort: List[tuple]):
+        # A filtered export follows the index that leads with its filter fields (staff, class or
+        # template, then the date); an unfiltered one walks the unique id index
+        sort = sort if query else [("id", 1)]
+        return collection.find(query, {"_id": 0}).sort(sort).batch_size(EXPORT_BATCH_SIZE)
+
+    @staticmethod
+    def export_attendance(file_format: str = "ndjson", compress: bool = False, staff_id: Optional[str] = None, class_name: Optional[str] = None,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None) -> AsyncIterator[bytes]:
+        """Attendance records as NDJSON (one record per line) or CSV (one student per row)"""
+        ExportService._check_format(file_format)
+        query: Dict[str, Any] = {}
+        if staff_id:
+            query["staff_id"] = staff_id
+        if class_name:
+            query["class_name"] = class_name
+        if date_from or date_to:
+            query["date"] = date_range(date_from, date_to)
+        cursor = ExportService._cursor(attendance_records_collection, query, [("date", 1), ("id", 1)])
+
+        async def lines() -> AsyncIterator[str]:
+            if file_format == "csv":
+                yield _csv_line(ATTENDANCE_CSV_COLUMNS)
+            async for stored in cursor:
+                # Rosters are cached, so joining the students back in rarely costs a query
+                try:
+                    document = (await RosterService.expand([stored]))[0]
+                except ValueError as e:
+                    # The status line has already gone out, so raising would only truncate the file
+                    logger.error(f"Exporting attendance record {stored.get('id')} without students: {e}")
+                    document = {key: value for key, value in stored.items() if key not in ("roster_id", "statuses")}
+                    document["students"] = []
+                # Exported as YYYY-MM-DD, as the API returns it
+                if isinstance(document.get("date"), datetime):
+                    document["date"] = document["date"].date()
+                if file_format == "ndjson":
+                    yield json.dumps(document, default=_json_default) + "\n"
+                    continue
+                for student in document.get("students", []):
+                    yield _csv_line([
+                        document["id"], document.get("class_name"), document.get("date"), document.get("staff_id"),
+                        student.get("id"), student.get("name"), student.get("status")
+                    ])
+
+        return _encode(lines(), compress)
+
+    @staticmethod
+    def export_submissions(file_format: str = "ndjson", compress: bool = False, staff_id: Optional[str] = None, template_id: Optional[str] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None) -> AsyncIterator[bytes]:
+        """Form submissions as NDJSON or CSV (the data object as a JSON column), filtered by created_at day"""
+        ExportService._check_format(file_format)
+        query: Dict[str, Any] = {}
+        if staff_id:
+            query["staff_id"] = staff_id
+        if template_id:
+            query["template_id"] = template_id
+        if date_from or date_to:
+            query["created_at"] = {}
+            if date_from:
+                query["created_at"]["$gte"] = datetime.combine(date_from, time.min)
+            if date_to:
+                query["created_at"]["$lt"] = datetime.combine(date_to + timedelta(days=1), time.min)
+        cursor = ExportService._cursor(form_submissions_collection, query, [("created_at", 1), ("id", 1)])
+
+        async def lines() -> AsyncIterator[str]:
+            if file_format == "csv":
+                yield _csv_line(SUBMISSION_CSV_COLUMNS)
+            async for document in cursor:
+                if file_format == "ndjson":
+                    yield json.dumps(document, default=_json_default) + "\n"
+                    continue
+                yield _csv_line([
+                    *(document.get(column) for column in SUBMISSION_CSV_COLUMNS[:-1]),
+                    json.dumps(document.get("data", {}), default=_json_default)
+                ])
+
+        return _encode(lines(), compress)
@@ -0,0 +1,105 @@
+from datetime import date, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..models import Template
+
+class FormValidationError(ValueError):
+    """Submission data does not match its template; `errors` lists one entry per offending field"""
+
+    def __init__(self, errors: List[Dict[str, str]]):
+        super().__init__("; ".join(f"{error['field']}: {error['message']}" for error in errors))
+        self.errors = errors
+
+def _is_text(value: Any) -> bool:
+    return isinstance(value, str)
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    # Form inputs (and voice conversion) send numbers as strings
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+def _is_date(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def _is_time(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        time.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def _is_checkbox(value: Any) -> bool:
+    return isinstance(value, bool)
+
+# Field type -> (check, message). Unknown types are accepted as-is
+_TYPE_CHECKS: Dict[str, Tuple[Callable[[Any], bool], str]] = {
+    "text": (_is_text, "must be text"),
+    "textarea": (_is_text, "must be text"),
+    "select": (_is_text, "must be text"),
+    "number": (_is_number, "must be a number"),
+    "date": (_is_date, "must be a date (YYYY-MM-DD)"),
+    "time": (_is_time, "must be a time (HH:MM)"),
+    "checkbox": (_is_checkbox, "must be true or false"),
+}
+
+def _is_blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+class CompiledTemplate:
+    """Check table built once from a template's fields.
+
+    Each entry is (name, required, type check, message, options), with select
+    options held as a casefolded-value -> option map, so validating a
+    submission is one pass over the template's fields with no per-request
+    parsing of the template.
+    """
+
+    def __init__(self, template: Template):
+        self.template_id = template.id
+        self.template_name = template.name
+        checks = []
+        for field in template.fields:
+            check, message = _TYPE_CHECKS.get(field.type, (None, None))
+            options: Optional[Dict[str, str]] = {option.casefold(): option for option in field.options} if field.options else None
+            checks.append((field.name, field.required, check, message, options))
+        self.checks = tuple(checks)
+
+    def validate(self, data: Dict[str, Any], enforce_required: bool = True):
+        """Raise FormValidationError listing every field that fails. Fields not in the template are kept as-is.
+
+        Select values are matched ignoring case (voice conversion extracts
+        lowercase keywords) and rewritten in `data` to the option's spelling.
+        """
+        errors = []
+        for name, required, check, message, options in self.checks:
+            value = data.get(name)
+            if _is_blank(value):
+                if required and enforce_required:
+                    errors.append({"field": name, "message": "is required"})
+                continue
+            if check is not None and not check(value):
+                errors.append({"field": name, "message": message})
+            elif options is not None:
+                option = options.get(value.casefold()) if isinstance(value, str) else None
+                if option is None:
+                    errors.append({"field": name, "message": f"must be one of: {', '.join(sorted(options.values()))}"})
+                else:
+                    data[name] = option
+        if errors:
+            raise FormValidationError(errors)
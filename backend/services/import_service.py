@@ -0,0 +1,286 @@
+import codecs
+import csv
+import io
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+from ..database import staff_profiles_collection, schedules_collection, attendance_records_collection
+from ..models import ScheduleCreate, StaffProfileCreate, AttendanceRecordCreate, ImportResult, ImportRowError
+from .schedule_service import ScheduleService
+from .staff_service import StaffService
+from .attendance_service import AttendanceService
+from .roster_service import RosterService
+from .attendance_rollup_service import AttendanceRollupService
+from .staff_stats_service import StaffStatsService
+from .dashboard_service import DashboardService
+from .versioning import CollectionVersions, schedules_version_key
+
+# Rows validated and written per insert_many; bounds memory regardless of upload size
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+# Errors beyond this are counted but not listed in the result
+MAX_REPORTED_ERRORS = 1000
+# Longest line (or multi-line CSV row) read from an upload; longer ones are dropped as they arrive and reported as failed
+IMPORT_MAX_LINE_BYTES = int(os.environ.get("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+class InvalidImportError(ValueError):
+    """Raised when an upload cannot be read at all (unknown format, missing or oversized CSV header)"""
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        )
+    return str(error)
+
+def _line_too_long() -> ValueError:
+    return ValueError(f"line is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Decode a byte stream into lines (newlines kept) without buffering more than one line.
+
+    A line longer than IMPORT_MAX_LINE_BYTES is discarded as it arrives and
+    yielded as a ValueError in its place.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    discarding = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line += "\n"
+            if discarding or len(line.encode()) > IMPORT_MAX_LINE_BYTES:
+                discarding = False
+                yield _line_too_long()
+            else:
+                yield line
+        if discarding or len(pending.encode()) > IMPORT_MAX_LINE_BYTES:
+            discarding, pending = True, ""
+    pending += decoder.decode(b"", final=True)
+    if discarding or len(pending.encode()) > IMPORT_MAX_LINE_BYTES:
+        yield _line_too_long()
+    elif pending:
+        yield pending
+
+async def _iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(line number, parsed value or the parse error) for each non-blank line"""
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if isinstance(line, Exception):
+            yield line_number, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+async def _iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(row number, {header: value}) for each CSV row; quoted fields may span lines.
+
+    Past a row longer than IMPORT_MAX_LINE_BYTES there is no telling where
+    the next row starts (it may have ended inside a quoted field), so that
+    row is reported as failed and the rest of the upload is not read.
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    record_size = 0
+    row_number = 0
+    async for line in _iter_lines(chunks):
+        if not isinstance(line, Exception):
+            record += line
+            record_size += len(line.encode())
+        if isinstance(line, Exception) or record_size > IMPORT_MAX_LINE_BYTES:
+            if header is None:
+                raise InvalidImportError(f"CSV header row is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+            yield row_number + 1, ValueError(f"row is longer than {IMPORT_MAX_LINE_BYTES} bytes; the rest of the upload was not read")
+            return
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader(io.StringIO(record)), [])
+        record, record_size = "", 0
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, ValueError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row_number, {name: value for name, value in zip(header, values) if value != ""}
+    if header is None:
+        raise InvalidImportError("CSV upload has no header row")
+
+def _split_list(value: Any) -> Any:
+    # CSV list cells are semicolon separated: "Math;Physics"
+    return [item.strip() for item in value.split(";") if item.strip()] if isinstance(value, str) else value
+
+def _staff_from_row(row: Dict[str, Any]) -> StaffProfileCreate:
+    if "subjects" in row:
+        row = {**row, "subjects": _split_list(row["subjects"])}
+    return StaffProfileCreate(**row)
+
+def _attendance_from_row(row: Dict[str, Any]) -> AttendanceRecordCreate:
+    return AttendanceRecordCreate(**row)
+
+def _schedule_from_row(row: Dict[str, Any]) -> ScheduleCreate:
+    return ScheduleCreate(**row)
+
+async def _group_attendance_csv(rows: AsyncIterator[Tuple[int, Any]]) -> AsyncIterator[Tuple[int, Any]]:
+    """Fold consecutive CSV rows (one per student) into one record per (staff_id, class_name, date).
+
+    Expected columns: staff_id, class_name, date, student_name and an optional
+    status. Rows for a record must be contiguous, which keeps only one record
+    in memory at a time; the record is reported under its first row number.
+    """
+    current_key = None
+    current: Optional[Dict[str, Any]] = None
+    first_row = 0
+    async for row_number, row in rows:
+        if isinstance(row, Exception):
+            yield row_number, row
+            continue
+        key = (row.get("staff_id"), row.get("class_name"), row.get("date"))
+        if key != current_key:
+            if current is not None:
+                yield first_row, current
+            current_key, first_row = key, row_number
+            current = {"staff_id": key[0], "class_name": key[1], "date": key[2], "students": []}
+        student = {"name": row.get("student_name")}
+        if row.get("status"):
+            student["status"] = row["status"]
+        current["students"].append(student)
+    if current is not None:
+        yield first_row, current
+
+class ImportService:
+    """Bulk loading of uploaded CSV / NDJSON files.
+
+    Uploads are parsed as they stream in and written IMPORT_BATCH_SIZE
+    validated rows at a time with unordered insert_many, so memory use does
+    not grow with the file. Rows that fail validation or insertion are
+    reported by row number and do not stop the rest of the import; only a
+    CSV row over IMPORT_MAX_LINE_BYTES ends it early (see _iter_csv).
+    """
+
+    @staticmethod
+    async def _run(chunks: AsyncIterator[bytes], file_format: str, parse_row: Callable[[Dict[str, Any]], BaseModel],
+                   build_document: Callable[[BaseModel], dict], write_batch: Callable, group_rows: Optional[Callable] = None) -> ImportResult:
+        if file_format not in IMPORT_FORMATS:
+            raise InvalidImportError(f"Unsupported import format: {file_format}")
+        rows = _iter_csv(chunks) if file_format == "csv" else _iter_ndjson(chunks)
+        if group_rows is not None and file_format == "csv":
+            rows = group_rows(rows)
+
+        result = ImportResult(format=file_format)
+
+        def fail(row_number: int, error: Exception):
+            result.failed += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(ImportRowError(row=row_number, error=_error_message(error)))
+
+        batch: List[Tuple[int, dict]] = []
+
+        async def flush():
+            failures = await write_batch(batch)
+            for row_number, error in failures:
+                fail(row_number, error)
+            result.inserted += len(batch) - len(failures)
+            batch.clear()
+
+        async for row_number, row in rows:
+            result.total_rows += 1
+            if isinstance(row, Exception):
+                fail(row_number, row)
+                continue
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("expected a JSON object")
+                batch.append((row_number, build_document(parse_row(row))))
+            except (ValidationError, ValueError, TypeError) as e:
+                fail(row_number, e)
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+        return result
+
+    @staticmethod
+    async def _insert_batch(collection, batch: List[Tuple[int, dict]]) -> Tuple[List[dict], List[Tuple[int, Exception]]]:
+        """Insert a batch unordered; returns the inserted documents and per-row failures"""
+        documents = [document for _, document in batch]
+        if not documents:
+            return [], []
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed_indexes = {}
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes[write_error["index"]] = ValueError(write_error.get("errmsg", "insert failed"))
+            failures = [(batch[index][0], error) for index, error in failed_indexes.items()]
+            inserted = [document for index, document in enumerate(documents) if index not in failed_indexes]
+            return inserted, failures
+        return documents, []
+
+    @staticmethod
+    async def import_schedules(chunks: AsyncIterator[bytes], file_format: str) -> ImportResult:
+        """Import schedule rows (ScheduleCreate fields; the class column is `class`)"""
+        async def write_batch(batch):
+            inserted, failures = await ImportService._insert_batch(schedules_collection, batch)
+            await StaffStatsService.apply_inserted(schedules=inserted)
+            staff_ids = {document["staff_id"] for document in inserted}
+            for staff_id in staff_ids:
+                DashboardService.invalidate_staff(staff_id)
+            await CollectionVersions.bump(*(schedules_version_key(staff_id) for staff_id in staff_ids))
+            return failures
+
+        return await ImportService._run(chunks, file_format, _schedule_from_row, ScheduleService.build_document, write_batch)
+
+    @staticmethod
+    async def import_staff_profiles(chunks: AsyncIterator[bytes], file_format: str) -> ImportResult:
+        """Import staff profiles; emails already on file (or repeated in the upload) are rejected"""
+
+        async def write_batch(batch):
+            emails = [document["email"] for _, document in batch]
+            taken = {
+                document["email"]
+                async for document in staff_profiles_collection.find({"email": {"$in": emails}}, {"_id": 0, "email": 1})
+            }
+            accepted, failures = [], []
+            for row_number, document in batch:
+                if document["email"] in taken:
+                    failures.append((row_number, ValueError(f"Staff member with email {document['email']} already exists")))
+                else:
+                    taken.add(document["email"])
+                    accepted.append((row_number, document))
+            _, insert_failures = await ImportService._insert_batch(staff_profiles_collection, accepted)
+            return failures + insert_failures
+
+        return await ImportService._run(chunks, file_format, _staff_from_row, StaffService.build_document, write_batch)
+
+    @staticmethod
+    async def import_attendance_records(chunks: AsyncIterator[bytes], file_format: str) -> ImportResult:
+        """Import attendance records: one record per NDJSON line, or one student per CSV row"""
+        async def write_batch(batch):
+            # Rosters resolve from cache once a class has been seen, so this is mostly in-memory
+            batch = [(row_number, await RosterService.compact(document)) for row_number, document in batch]
+            inserted, failures = await ImportService._insert_batch(attendance_records_collection, batch)
+            await StaffStatsService.apply_inserted(attendance_records=inserted)
+            await AttendanceRollupService.apply_inserted(inserted)
+            for staff_id in {document["staff_id"] for document in inserted}:
+                DashboardService.invalidate_staff(staff_id)
+            return failures
+
+        return await ImportService._run(
+            chunks, file_format, _attendance_from_row, AttendanceService.build_document, write_batch,
+            group_rows=_group_attendance_csv
+        )
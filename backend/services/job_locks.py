@@ -0,0 +1,61 @@
+from typing import Optional
+from datetime import datetime, timedelta
+import os
+from pymongo.errors import DuplicateKeyError
+from ..database import job_locks_collection
+from ..ids import new_id
+
+# How long a holder may go without renewing before its lock can be taken over
+JOB_LOCK_TTL_SECONDS = float(os.environ.get("JOB_LOCK_TTL_SECONDS", "300"))
+
+class JobLockedError(RuntimeError):
+    """Raised when a job's lock is held by another worker or job run, or was lost while running"""
+
+class JobLocks:
+    """Named locks for jobs that must not run twice at once, across workers and job scripts.
+
+    A lock is one job_locks document per name. Taking it upserts that document
+    only if its lease has expired, so while another holder's lease is live
+    the unique name index turns the upsert into a DuplicateKeyError. Holders
+    renew the lease as they make progress; a holder that dies leaves a lease
+    that runs out. The document also records when the job last completed.
+    """
+
+    @staticmethod
+    async def acquire(name: str) -> Optional[str]:
+        """Take the lock; returns the holder's token, or None if it is held"""
+        owner = new_id()
+        now = datetime.utcnow()
+        try:
+            await job_locks_collection.update_one(
+                {"name": name, "expires_at": {"$lte": now}},
+                {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=JOB_LOCK_TTL_SECONDS)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return owner
+
+    @staticmethod
+    async def renew(name: str, owner: str) -> bool:
+        """Extend the lease; False if the lock was taken over after it expired"""
+        result = await job_locks_collection.update_one(
+            {"name": name, "owner": owner},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=JOB_LOCK_TTL_SECONDS)}}
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    async def release(name: str, owner: str, completed: bool = False):
+        """Give the lock up, recording the job as completed if it ran to the end"""
+        now = datetime.utcnow()
+        update = {"expires_at": now}
+        if completed:
+            update["completed_at"] = now
+        await job_locks_collection.update_one({"name": name, "owner": owner}, {"$set": update})
+
+    @staticmethod
+    async def completed(name: str) -> bool:
+        """Whether the job has ever run to completion"""
+        document = await job_locks_collection.find_one({"name": name}, {"_id": 0, "completed_at": 1})
+        return bool(document and document.get("completed_at"))
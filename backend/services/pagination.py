@@ -0,0 +1,39 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Tuple
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursorError(ValueError):
+    """Raised when an `after` cursor cannot be decoded or does not fit the listing"""
+
+def encode_cursor(document: Dict[str, Any], sort: List[Tuple[str, int]]) -> str:
+    """Opaque cursor holding the sort-key values of the last document on a page"""
+    values = [document.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return values
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """Match documents strictly after `values` in `sort` order.
+
+    For sort keys (a, b, id) this is: a past A, or a == A and b past B, or
+    a == A and b == B and id past ID, which a compound index on the same keys
+    answers with a bounded scan.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prior: values[j] for j, (prior, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
@@ -0,0 +1,152 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, Type, TypeVar, get_args
+from datetime import date, datetime
+from pydantic import BaseModel
+from ..models import Page
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def millisecond_precision(value: datetime) -> datetime:
+    """A datetime as Mongo stores it: truncated to milliseconds"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def truncate_datetimes(value: Any) -> Any:
+    """Truncate every datetime in a document (in place) to what Mongo will store"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            value[key] = truncate_datetimes(item)
+    elif isinstance(value, list):
+        value[:] = [truncate_datetimes(item) for item in value]
+    elif isinstance(value, datetime):
+        return millisecond_precision(value)
+    return value
+
+class Repository(Generic[ModelT]):
+    """Data access for one collection and the model its documents are read into.
+
+    `expand`, if given, turns stored documents into the shape the model
+    expects (for example joining data kept in another collection); it is
+    applied to every batch of documents read or inserted.
+    """
+
+    def __init__(self, collection, model: Type[ModelT], expand: Optional[Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]] = None):
+        self.collection = collection
+        self.model = model
+        self.expand = expand
+        # Response keys (aliases where set, as response models serialize them) in field order
+        self._trusted_keys = tuple(field.alias or name for name, field in model.model_fields.items())
+        # Calendar-date fields, stored as midnight datetimes (see services.dates)
+        self._date_keys = tuple(
+            field.alias or name for name, field in model.model_fields.items()
+            if date in (field.annotation, *get_args(field.annotation))
+        )
+
+    def to_model(self, document: Dict[str, Any]) -> ModelT:
+        """Build the model from a raw document, dropping Mongo's _id"""
+        document.pop("_id", None)
+        return self.model(**document)
+
+    async def prepare(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Stored documents in the shape the model expects"""
+        if self.expand is None or not documents:
+            return documents
+        return await self.expand(documents)
+
+    def to_trusted(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a raw document straight to its response shape, without building or validating the model.
+
+        Only for documents this application wrote: they are already valid, so
+        the mapping just keeps the model's keys (dropping _id and anything
+        else), leaves out keys a projection did not select and turns stored
+        dates back into dates.
+        """
+        trusted = {key: document[key] for key in self._trusted_keys if key in document}
+        for key in self._date_keys:
+            if isinstance(trusted.get(key), datetime):
+                trusted[key] = trusted[key].date()
+        return trusted
+
+    async def insert(self, document: Dict[str, Any]) -> ModelT:
+        """Insert a document and build the model from it, without reading it back.
+
+        Datetimes are truncated first, so the model (and any ETag or
+        Last-Modified derived from it) matches what later reads return.
+        """
+        truncate_datetimes(document)
+        await self.collection.insert_one(document)
+        return self.to_model((await self.prepare([document]))[0])
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> List[ModelT]:
+        """Insert a batch of documents in one round trip"""
+        if not documents:
+            return []
+        truncate_datetimes(documents)
+        await self.collection.insert_many(documents, ordered=ordered)
+        return [self.to_model(document) for document in await self.prepare(documents)]
+
+    async def get(self, id: str) -> Optional[ModelT]:
+        """Get a document by its application id"""
+        document = await self.collection.find_one({"id": id})
+        if document:
+            return self.to_model((await self.prepare([document]))[0])
+        return None
+
+    async def get_document(self, id: str) -> Optional[Dict[str, Any]]:
+        """Get a raw document by its application id, without building the model"""
+        return await self.collection.find_one({"id": id}, {"_id": 0})
+
+    async def find_one(self, query: Dict[str, Any]) -> Optional[ModelT]:
+        """Get the first document matching a query"""
+        document = await self.collection.find_one(query)
+        if document:
+            return self.to_model((await self.prepare([document]))[0])
+        return None
+
+    async def find(self, query: Dict[str, Any], sort: Optional[List[tuple]] = None, limit: int = 0, projection: Optional[Dict[str, Any]] = None, trusted: bool = False) -> List[ModelT]:
+        """Get all documents matching a query; with trusted=True as response-shaped dicts (see to_trusted)"""
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        convert = self.to_trusted if trusted else self.to_model
+        documents = await self.prepare([document async for document in cursor])
+        return [convert(document) for document in documents]
+
+    async def iterate(self, query: Dict[str, Any], sort: Optional[List[tuple]] = None, batch_size: int = 0) -> AsyncIterator[ModelT]:
+        """Stream models matching a query without collecting them into a list"""
+        cursor = self.collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async for document in cursor:
+            yield self.to_model((await self.prepare([document]))[0])
+
+    async def paginate(self, query: Dict[str, Any], sort: List[Tuple[str, int]], limit: int, after: Optional[str] = None, projection: Optional[Dict[str, Any]] = None, trusted: bool = False) -> Page:
+        """One keyset page of results; `sort` must end with a unique key such as id.
+
+        With trusted=True the items are response-shaped dicts (see to_trusted)
+        and the page is built without validation.
+        """
+        if after:
+            query = {"$and": [query, keyset_filter(sort, decode_cursor(after, sort))]}
+        if projection is not None:
+            # The cursor is built from the sort keys, so they are always fetched
+            projection = {**projection, **{field: 1 for field, _ in sort}}
+        # One extra document tells us whether another page follows
+        cursor = self.collection.find(query, projection).sort(sort).limit(limit + 1)
+        convert = self.to_trusted if trusted else self.to_model
+        build_page = Page.construct if trusted else Page
+        documents = [document async for document in cursor]
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor(documents[-1], sort)
+        items = [convert(document) for document in await self.prepare(documents)]
+        return build_page(items=items, next_cursor=next_cursor)
+
+    async def delete(self, id: str) -> bool:
+        """Delete a document by its application id"""
+        result = await self.collection.delete_one({"id": id})
+        return result.deleted_count > 0
@@ -0,0 +1,205 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import os
+from pymongo.errors import DuplicateKeyError
+from ..database import class_rosters_collection
+from ..ids import new_id
+from ..models import AttendanceStatus
+from .cache import LRUTTLCache
+
+# One small code per student, in roster order. Codes are stored, so never reorder them
+STATUS_CODES: Dict[str, int] = {
+    AttendanceStatus.present.value: 0,
+    AttendanceStatus.absent.value: 1,
+    AttendanceStatus.late.value: 2,
+}
+CODE_STATUSES = tuple(sorted(STATUS_CODES, key=STATUS_CODES.get))
+
+# Roster versions never change once written, so cached copies never go stale
+roster_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("ROSTER_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.environ.get("ROSTER_CACHE_TTL_SECONDS", "86400"))
+)
+# Latest known version per (staff_id, class_name). A stale entry is still a
+# valid roster to reference; it only means a newer version may get created
+latest_roster_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("ROSTER_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.environ.get("ROSTER_CACHE_TTL_SECONDS", "86400"))
+)
+# Roster versions listing a student, as roster id -> (position, roster size).
+# Versions created by other workers are missing until the entry is refreshed
+student_rosters_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("ROSTER_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.environ.get("ROSTER_CACHE_TTL_SECONDS", "86400"))
+)
+
+def totals_from_statuses(statuses: List[int]) -> Dict[str, int]:
+    """Attendance totals for a packed status array"""
+    totals = {"total_students": len(statuses)}
+    for status, code in STATUS_CODES.items():
+        totals[status] = statuses.count(code)
+    return totals
+
+def _status_value(status: Any) -> str:
+    if status is None:
+        return AttendanceStatus.present.value
+    return status.value if isinstance(status, AttendanceStatus) else status
+
+def _cache(roster: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache a roster version along with its student id -> ordinal lookup"""
+    roster = {**roster, "positions": {student["id"]: index for index, student in enumerate(roster["students"])}}
+    roster_cache.set(roster["id"], roster)
+    for student_id, position in roster["positions"].items():
+        placements = student_rosters_cache.get(student_id)
+        if placements is not None:
+            placements[roster["id"]] = (position, len(roster["students"]))
+    return roster
+
+class RosterService:
+    """Class rosters: each class's students stored once, in stable ordinal positions.
+
+    A roster version is immutable. Attendance records reference one by
+    `roster_id` and keep only a packed `statuses` array (see STATUS_CODES)
+    aligned with its students; a record whose student list differs from the
+    class's latest roster gets a new version, so older records keep theirs.
+    """
+
+    @staticmethod
+    async def get_roster(roster_id: str) -> Optional[Dict[str, Any]]:
+        roster = roster_cache.get(roster_id)
+        if roster is None:
+            document = await class_rosters_collection.find_one({"id": roster_id}, {"_id": 0})
+            if document:
+                roster = _cache(document)
+        return roster
+
+    @staticmethod
+    async def get_rosters(roster_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Rosters by id; cache misses are read in one query"""
+        rosters = {}
+        missing = []
+        for roster_id in dict.fromkeys(roster_ids):
+            roster = roster_cache.get(roster_id)
+            if roster is None:
+                missing.append(roster_id)
+            else:
+                rosters[roster_id] = roster
+        if missing:
+            async for document in class_rosters_collection.find({"id": {"$in": missing}}, {"_id": 0}):
+                rosters[document["id"]] = _cache(document)
+        return rosters
+
+    @staticmethod
+    async def student_placements(student_id: str, refresh: bool = False) -> Dict[str, Tuple[int, int]]:
+        """Every roster version listing a student, as roster id -> (position, roster size)"""
+        if not refresh:
+            placements = student_rosters_cache.get(student_id)
+            if placements is not None:
+                return placements
+        placements = {}
+        async for document in class_rosters_collection.find({"students.id": student_id}, {"_id": 0, "id": 1, "students.id": 1}):
+            ids = [entry["id"] for entry in document["students"]]
+            placements[document["id"]] = (ids.index(student_id), len(ids))
+        student_rosters_cache.set(student_id, placements)
+        return placements
+
+    @staticmethod
+    async def _latest(staff_id: str, class_name: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        key = (staff_id, class_name)
+        if not refresh:
+            roster_id = latest_roster_cache.get(key)
+            if roster_id is not None:
+                return await RosterService.get_roster(roster_id)
+        document = await class_rosters_collection.find_one(
+            {"staff_id": staff_id, "class_name": class_name}, {"_id": 0}, sort=[("version", -1)]
+        )
+        if not document:
+            return None
+        latest_roster_cache.set(key, document["id"])
+        return _cache(document)
+
+    @staticmethod
+    def _match(roster: Optional[Dict[str, Any]], students: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Roster entries for a record's students: known ids are kept, otherwise a
+        roster student of the same name is reused, otherwise the student is new"""
+        if roster is None:
+            return [{"id": student.get("id") or new_id(), "name": student["name"]} for student in students]
+        by_name: Dict[str, List[str]] = {}
+        for entry in roster["students"]:
+            by_name.setdefault(entry["name"], []).append(entry["id"])
+        used = set()
+        entries = []
+        for student in students:
+            student_id = student.get("id")
+            if student_id not in roster["positions"] or student_id in used:
+                same_name = [candidate for candidate in by_name.get(student["name"], []) if candidate not in used]
+                if same_name:
+                    student_id = same_name[0]
+                elif not student_id or student_id in used:
+                    student_id = new_id()
+            used.add(student_id)
+            entries.append({"id": student_id, "name": student["name"]})
+        return entries
+
+    @staticmethod
+    async def resolve(staff_id: str, class_name: str, students: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """The roster version whose students, in order, are exactly these; created if needed"""
+        refresh = False
+        while True:
+            latest = await RosterService._latest(staff_id, class_name, refresh)
+            entries = RosterService._match(latest, students)
+            if latest is not None and latest["students"] == entries:
+                return latest
+            roster = {
+                "id": new_id(),
+                "staff_id": staff_id,
+                "class_name": class_name,
+                "version": latest["version"] + 1 if latest else 1,
+                "students": entries,
+                "created_at": datetime.utcnow(),
+            }
+            try:
+                await class_rosters_collection.insert_one(roster)
+            except DuplicateKeyError:
+                # Another writer created this version first (or our latest was stale): re-read and retry
+                refresh = True
+                continue
+            roster.pop("_id", None)
+            latest_roster_cache.set((staff_id, class_name), roster["id"])
+            return _cache(roster)
+
+    @staticmethod
+    async def compact(document: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a record document with an embedded students list into its stored form"""
+        students = document["students"]
+        roster = await RosterService.resolve(document["staff_id"], document["class_name"], students)
+        compacted = {key: value for key, value in document.items() if key != "students"}
+        compacted["roster_id"] = roster["id"]
+        compacted["statuses"] = [STATUS_CODES[_status_value(student.get("status"))] for student in students]
+        return compacted
+
+    @staticmethod
+    async def expand(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Stored record documents with the students list joined back from their rosters.
+
+        Documents read without the statuses (a projection) or still in the
+        legacy embedded form are returned as they are.
+        """
+        rosters = await RosterService.get_rosters([
+            document["roster_id"] for document in documents if "statuses" in document and "roster_id" in document
+        ])
+        expanded = []
+        for document in documents:
+            if "statuses" not in document or "roster_id" not in document:
+                expanded.append({key: value for key, value in document.items() if key != "roster_id"})
+                continue
+            roster = rosters.get(document["roster_id"])
+            if roster is None:
+                raise ValueError(f"Roster {document['roster_id']} of attendance record {document.get('id')} not found")
+            record = {key: value for key, value in document.items() if key not in ("roster_id", "statuses")}
+            record["students"] = [
+                {"id": entry["id"], "name": entry["name"], "status": CODE_STATUSES[code]}
+                for entry, code in zip(roster["students"], document["statuses"])
+            ]
+            expanded.append(record)
+        return expanded
@@ -1,52 +1,64 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+from pymongo import ReturnDocument
 from ..database import schedules_collection
-from ..models import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleStatus
+from ..ids import new_id
+from ..models import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleStatus, Page
+from .repository import Repository
+from .pagination import DEFAULT_PAGE_SIZE
+from .staff_stats_service import StaffStatsService
+from .versioning import CollectionVersions, schedules_version_key
+
+schedule_repository = Repository(schedules_collection, Schedule)
+
+# Ids are time-ordered, so this lists schedules in creation order
+STAFF_LISTING_SORT = [("id", 1)]
 
 class ScheduleService:
     
     @staticmethod
-    async def create_schedule(schedule_data: ScheduleCreate) -> Schedule:
-        """Create a new schedule entry"""
+    def build_document(schedule_data: ScheduleCreate) -> dict:
+        """Build the stored document for a new schedule entry"""
         schedule_dict = schedule_data.dict(by_alias=True)
-        schedule_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        schedule_dict["id"] = new_id()
         schedule_dict["created_at"] = datetime.utcnow()
         schedule_dict["updated_at"] = datetime.utcnow()
-        
-        result = await schedules_collection.insert_one(schedule_dict)
-        
-        created_schedule = await schedules_collection.find_one({"_id": result.inserted_id})
-        created_schedule.pop("_id", None)
-        
-        return Schedule(**created_schedule)
+        return schedule_dict
+    
+    @staticmethod
+    async def create_schedule(schedule_data: ScheduleCreate) -> Schedule:
+        """Create a new schedule entry"""
+        schedule = await schedule_repository.insert(ScheduleService.build_document(schedule_data))
+        await StaffStatsService.apply_schedule_change(schedule.staff_id, after_status=schedule.status)
+        await CollectionVersions.bump(schedules_version_key(schedule.staff_id))
+        return schedule
     
     @staticmethod
     async def get_schedule(schedule_id: str) -> Optional[Schedule]:
         """Get schedule by ID"""
-        schedule = await schedules_collection.find_one({"id": schedule_id})
-        if schedule:
-            schedule.pop("_id", None)
-            return Schedule(**schedule)
-        return None
+        return await schedule_repository.get(schedule_id)
+    
+    @staticmethod
+    async def get_schedule_document(schedule_id: str) -> Optional[dict]:
+        """Get the raw schedule document, for conditional GETs"""
+        return await schedule_repository.get_document(schedule_id)
+    
+    @staticmethod
+    async def get_schedules_version(staff_id: str):
+        """(version, last changed) of a staff member's schedule listings"""
+        return await CollectionVersions.get(schedules_version_key(staff_id))
     
     @staticmethod
-    async def get_schedules_by_staff(staff_id: str) -> List[Schedule]:
-        """Get all schedules for a staff member"""
-        schedules = []
-        cursor = schedules_collection.find({"staff_id": staff_id})
-        async for schedule in cursor:
-            schedule.pop("_id", None)
-            schedules.append(Schedule(**schedule))
-        return schedules
+    async def get_schedules_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, trusted: bool = False) -> Page[Schedule]:
+        """Get a page of schedules for a staff member; trusted=True returns raw response-shaped items"""
+        return await schedule_repository.paginate({"staff_id": staff_id}, STAFF_LISTING_SORT, limit, after, trusted=trusted)
     
     @staticmethod
-    async def get_schedules_by_day(staff_id: str, day: str) -> List[Schedule]:
-        """Get schedules for a specific day"""
-        schedules = []
-        cursor = schedules_collection.find({"staff_id": staff_id, "day": day})
-        async for schedule in cursor:
-            schedule.pop("_id", None)
-            schedules.append(Schedule(**schedule))
+    async def get_schedules_by_day(staff_id: str, day: str, trusted: bool = False) -> List[Schedule]:
+        """Get schedules for a specific day; trusted=True returns raw response-shaped items"""
+        schedules = await schedule_repository.find({"staff_id": staff_id, "day": day}, trusted=trusted)
+        if trusted:
+            return sorted(schedules, key=lambda x: x["time"])
         return sorted(schedules, key=lambda x: x.time)
     
     @staticmethod
@@ -58,46 +70,75 @@ class ScheduleService:
         
         update_dict["updated_at"] = datetime.utcnow()
         
-        result = await schedules_collection.update_one(
+        before = await schedules_collection.find_one_and_update(
             {"id": schedule_id},
-            {"$set": update_dict}
+            {"$set": update_dict},
+            projection={"_id": 0, "staff_id": 1, "status": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if not before:
+            return None
         
-        if result.modified_count:
-            return await ScheduleService.get_schedule(schedule_id)
-        return None
+        schedule = await ScheduleService.get_schedule(schedule_id)
+        await ScheduleService._record_update(before, schedule)
+        return schedule
     
     @staticmethod
     async def update_schedule_status(schedule_id: str, status: ScheduleStatus) -> Optional[Schedule]:
         """Update schedule status"""
-        result = await schedules_collection.update_one(
+        before = await schedules_collection.find_one_and_update(
             {"id": schedule_id},
-            {"$set": {"status": status.value, "updated_at": datetime.utcnow()}}
+            {"$set": {"status": status.value, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "staff_id": 1, "status": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if not before:
+            return None
         
-        if result.modified_count:
-            return await ScheduleService.get_schedule(schedule_id)
-        return None
+        schedule = await ScheduleService.get_schedule(schedule_id)
+        await ScheduleService._record_update(before, schedule)
+        return schedule
+    
+    @staticmethod
+    async def _record_update(before: dict, schedule: Optional[Schedule]):
+        """Move the schedule between status counters if its status or owner changed, and bump listing versions"""
+        staff_ids = {before["staff_id"]} | ({schedule.staff_id} if schedule else set())
+        await CollectionVersions.bump(*(schedules_version_key(staff_id) for staff_id in staff_ids))
+        if schedule is None:
+            await StaffStatsService.apply_schedule_change(before["staff_id"], before_status=before.get("status"))
+        elif schedule.staff_id != before["staff_id"]:
+            await StaffStatsService.apply_schedule_change(before["staff_id"], before_status=before.get("status"))
+            await StaffStatsService.apply_schedule_change(schedule.staff_id, after_status=schedule.status)
+        elif schedule.status.value != before.get("status"):
+            await StaffStatsService.apply_schedule_change(schedule.staff_id, before.get("status"), schedule.status)
     
     @staticmethod
     async def delete_schedule(schedule_id: str) -> bool:
         """Delete schedule entry"""
-        result = await schedules_collection.delete_one({"id": schedule_id})
-        return result.deleted_count > 0
+        deleted = await schedules_collection.find_one_and_delete(
+            {"id": schedule_id},
+            projection={"_id": 0, "staff_id": 1, "status": 1}
+        )
+        if not deleted:
+            return False
+        await StaffStatsService.apply_schedule_change(deleted["staff_id"], before_status=deleted.get("status"))
+        await CollectionVersions.bump(schedules_version_key(deleted["staff_id"]))
+        return True
     
     @staticmethod
     async def get_schedule_stats(staff_id: str) -> dict:
         """Get schedule statistics"""
-        total_schedules = await schedules_collection.count_documents({"staff_id": staff_id})
-        scheduled = await schedules_collection.count_documents({"staff_id": staff_id, "status": "scheduled"})
-        substitution_needed = await schedules_collection.count_documents({"staff_id": staff_id, "status": "substitution_needed"})
-        cancelled = await schedules_collection.count_documents({"staff_id": staff_id, "status": "cancelled"})
-        completed = await schedules_collection.count_documents({"staff_id": staff_id, "status": "completed"})
-        
+        stats = await ScheduleService.get_schedule_stats_for_staff([staff_id])
+        return stats[staff_id]
+    
+    @staticmethod
+    async def get_schedule_stats_for_staff(staff_ids: List[str]) -> Dict[str, dict]:
+        """Get schedule statistics for several staff members from their stats counters"""
+        counters = await StaffStatsService.get_counters_for_staff(staff_ids)
         return {
-            "total": total_schedules,
-            "scheduled": scheduled,
-            "substitution_needed": substitution_needed,
-            "cancelled": cancelled,
-            "completed": completed
+            staff_id: {
+                "total": staff_counters["schedules"]["total"],
+                **{schedule_status.value: staff_counters["schedules"][schedule_status.value] for schedule_status in ScheduleStatus}
+            }
+            for staff_id, staff_counters in counters.items()
         }
\ No newline at end of file
@@ -1,45 +1,42 @@
 from typing import List, Optional
 from datetime import datetime
 from ..database import staff_profiles_collection
+from ..ids import new_id
 from ..models import StaffProfile, StaffProfileCreate, StaffProfileUpdate
+from .repository import Repository
+
+staff_repository = Repository(staff_profiles_collection, StaffProfile)
 
 class StaffService:
     
     @staticmethod
-    async def create_staff_profile(staff_data: StaffProfileCreate) -> StaffProfile:
-        """Create a new staff profile"""
+    def build_document(staff_data: StaffProfileCreate) -> dict:
+        """Build the stored document for a new staff profile"""
         staff_dict = staff_data.dict()
-        staff_dict["id"] = staff_dict.get("id", str(datetime.now().timestamp()).replace(".", ""))
+        staff_dict["id"] = new_id()
         staff_dict["created_at"] = datetime.utcnow()
         staff_dict["updated_at"] = datetime.utcnow()
-        
-        # Insert into database
-        result = await staff_profiles_collection.insert_one(staff_dict)
-        
-        # Retrieve the created profile
-        created_profile = await staff_profiles_collection.find_one({"_id": result.inserted_id})
-        created_profile.pop("_id", None)
-        
-        return StaffProfile(**created_profile)
+        return staff_dict
+    
+    @staticmethod
+    async def create_staff_profile(staff_data: StaffProfileCreate) -> StaffProfile:
+        """Create a new staff profile"""
+        return await staff_repository.insert(StaffService.build_document(staff_data))
     
     @staticmethod
     async def get_staff_profile(staff_id: str) -> Optional[StaffProfile]:
         """Get staff profile by ID"""
-        profile = await staff_profiles_collection.find_one({"id": staff_id})
-        if profile:
-            profile.pop("_id", None)
-            return StaffProfile(**profile)
-        return None
+        return await staff_repository.get(staff_id)
+    
+    @staticmethod
+    async def get_staff_profile_document(staff_id: str) -> Optional[dict]:
+        """Get the raw staff profile document, for conditional GETs"""
+        return await staff_repository.get_document(staff_id)
     
     @staticmethod
     async def get_all_staff_profiles() -> List[StaffProfile]:
         """Get all staff profiles"""
-        profiles = []
-        cursor = staff_profiles_collection.find({})
-        async for profile in cursor:
-            profile.pop("_id", None)
-            profiles.append(StaffProfile(**profile))
-        return profiles
+        return await staff_repository.find({})
     
     @staticmethod
     async def update_staff_profile(staff_id: str, update_data: StaffProfileUpdate) -> Optional[StaffProfile]:
@@ -62,14 +59,9 @@ class StaffService:
     @staticmethod
     async def delete_staff_profile(staff_id: str) -> bool:
         """Delete staff profile"""
-        result = await staff_profiles_collection.delete_one({"id": staff_id})
-        return result.deleted_count > 0
+        return await staff_repository.delete(staff_id)
     
     @staticmethod
     async def get_staff_by_email(email: str) -> Optional[StaffProfile]:
         """Get staff profile by email"""
-        profile = await staff_profiles_collection.find_one({"email": email})
-        if profile:
-            profile.pop("_id", None)
-            return StaffProfile(**profile)
-        return None
\ No newline at end of file
+        return await staff_repository.find_one({"email": email})
\ No newline at end of file
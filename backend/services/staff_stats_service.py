@@ -0,0 +1,246 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import logging
+from pymongo.errors import DuplicateKeyError
+from ..database import staff_stats_collection, attendance_records_collection, schedules_collection, tasks_collection
+from ..models import ScheduleStatus
+from .job_locks import JobLocks, JobLockedError
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_TOTALS = ("total_students", "present", "absent", "late")
+
+# Fields an attendance write must return (as its before/after image) to keep the counters in step
+ATTENDANCE_TOTALS_PROJECTION = {"_id": 0, "staff_id": 1, "class_name": 1, "date": 1, **{field: 1 for field in ATTENDANCE_TOTALS}}
+
+REBUILD_LOCK = "staff_stats.rebuild"
+
+def _empty_counters() -> Dict[str, Dict[str, int]]:
+    return {
+        "attendance": {"records": 0, **{field: 0 for field in ATTENDANCE_TOTALS}},
+        "schedules": {"total": 0, **{schedule_status.value: 0 for schedule_status in ScheduleStatus}},
+        "tasks": {"completed": 0},
+    }
+
+def _status_value(status: Any) -> str:
+    return status.value if isinstance(status, ScheduleStatus) else status
+
+class StaffStatsService:
+    """Per-staff counters kept in step with $inc deltas by every write that changes them.
+
+    One staff_stats document per staff member holds attendance totals,
+    schedule counts per status and the completed-task count, so stats reads
+    are a single key lookup. rebuild() recomputes them from the source
+    collections and reports any drift.
+    """
+
+    @staticmethod
+    async def _increment(staff_id: str, delta: Dict[str, int]):
+        delta = {field: value for field, value in delta.items() if value}
+        if not delta:
+            return
+        await staff_stats_collection.update_one(
+            {"staff_id": staff_id},
+            {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    @staticmethod
+    def _attendance_delta(record: Optional[Dict[str, Any]], sign: int) -> Dict[str, int]:
+        if not record:
+            return {}
+        delta = {"attendance.records": sign}
+        for field in ATTENDANCE_TOTALS:
+            delta[f"attendance.{field}"] = sign * record.get(field, 0)
+        return delta
+
+    @staticmethod
+    async def apply_attendance_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply an attendance record going from `before` to `after` (None for create/delete)"""
+        deltas: Dict[str, Dict[str, int]] = {}
+        for record, sign in ((before, -1), (after, 1)):
+            for field, value in StaffStatsService._attendance_delta(record, sign).items():
+                staff_delta = deltas.setdefault(record["staff_id"], {})
+                staff_delta[field] = staff_delta.get(field, 0) + value
+        for staff_id, delta in deltas.items():
+            await StaffStatsService._increment(staff_id, delta)
+
+    @staticmethod
+    async def apply_schedule_change(staff_id: str, before_status: Any = None, after_status: Any = None):
+        """Apply a schedule moving between statuses (None for create/delete)"""
+        delta: Dict[str, int] = {}
+        if before_status is None:
+            delta["schedules.total"] = 1
+        if after_status is None:
+            delta["schedules.total"] = delta.get("schedules.total", 0) - 1
+        if before_status is not None:
+            delta[f"schedules.{_status_value(before_status)}"] = -1
+        if after_status is not None:
+            field = f"schedules.{_status_value(after_status)}"
+            delta[field] = delta.get(field, 0) + 1
+        await StaffStatsService._increment(staff_id, delta)
+
+    @staticmethod
+    async def apply_inserted(attendance_records: List[Dict[str, Any]] = (), schedules: List[Dict[str, Any]] = ()):
+        """Count a batch of newly inserted documents with one increment per staff member"""
+        deltas: Dict[str, Dict[str, int]] = {}
+        for record in attendance_records:
+            staff_delta = deltas.setdefault(record["staff_id"], {})
+            for field, value in StaffStatsService._attendance_delta(record, 1).items():
+                staff_delta[field] = staff_delta.get(field, 0) + value
+        for schedule in schedules:
+            staff_delta = deltas.setdefault(schedule["staff_id"], {})
+            for field in ("schedules.total", f"schedules.{_status_value(schedule['status'])}"):
+                staff_delta[field] = staff_delta.get(field, 0) + 1
+        for staff_id, delta in deltas.items():
+            await StaffStatsService._increment(staff_id, delta)
+
+    @staticmethod
+    async def apply_task_completed(staff_id: str):
+        await StaffStatsService._increment(staff_id, {"tasks.completed": 1})
+
+    @staticmethod
+    async def get_counters(staff_id: str) -> Dict[str, Dict[str, int]]:
+        """Counters for one staff member, zero-filled where nothing has been recorded yet"""
+        counters = await StaffStatsService.get_counters_for_staff([staff_id])
+        return counters[staff_id]
+
+    @staticmethod
+    async def get_counters_for_staff(staff_ids: List[str]) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Counters for several staff members.
+
+        Until a full rebuild has completed the stored counters may be missing
+        or partial, so they are aggregated from the source collections instead.
+        """
+        if not await JobLocks.completed(REBUILD_LOCK):
+            return await StaffStatsService._recompute(list(staff_ids))
+        counters = {staff_id: _empty_counters() for staff_id in staff_ids}
+        async for document in staff_stats_collection.find({"staff_id": {"$in": list(staff_ids)}}):
+            for section, values in _empty_counters().items():
+                counters[document["staff_id"]][section].update({**values, **document.get(section, {})})
+        return counters
+
+    @staticmethod
+    async def _recompute(staff_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Counters as the source collections currently have them"""
+        match = {"staff_id": {"$in": staff_ids}} if staff_ids is not None else {}
+        counters: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+        def staff_counters(staff_id: str) -> Dict[str, Dict[str, int]]:
+            return counters.setdefault(staff_id, _empty_counters())
+
+        attendance_pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$staff_id", "records": {"$sum": 1},
+                        **{field: {"$sum": f"${field}"} for field in ATTENDANCE_TOTALS}}}
+        ]
+        async for row in attendance_records_collection.aggregate(attendance_pipeline):
+            staff_counters(row.pop("_id"))["attendance"].update(row)
+
+        schedule_pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"staff_id": "$staff_id", "status": "$status"}, "count": {"$sum": 1}}}
+        ]
+        async for row in schedules_collection.aggregate(schedule_pipeline):
+            schedules = staff_counters(row["_id"]["staff_id"])["schedules"]
+            schedules["total"] += row["count"]
+            schedules[row["_id"]["status"]] = row["count"]
+
+        task_pipeline = [
+            {"$match": {**match, "completed": True}},
+            {"$group": {"_id": "$staff_id", "completed": {"$sum": 1}}}
+        ]
+        async for row in tasks_collection.aggregate(task_pipeline):
+            staff_counters(row["_id"])["tasks"]["completed"] = row["completed"]
+
+        for staff_id in staff_ids or []:
+            staff_counters(staff_id)
+        return counters
+
+    @staticmethod
+    async def _rebuild_staff(staff_id: str, dry_run: bool) -> Optional[Dict[str, Any]]:
+        """Correct one staff member's counters; returns their drift entry, if any"""
+        document = await staff_stats_collection.find_one({"staff_id": staff_id}, {"_id": 0})
+        actual = (await StaffStatsService._recompute([staff_id]))[staff_id]
+
+        snapshot = {}
+        drift = {}
+        for section, values in actual.items():
+            stored_values = (document or {}).get(section, {})
+            for field, value in values.items():
+                snapshot[f"{section}.{field}"] = stored_values.get(field)
+                if stored_values.get(field, 0) != value:
+                    drift[f"{section}.{field}"] = {"stored": stored_values.get(field, 0), "actual": value}
+        if not drift:
+            return None
+        entry = {"staff_id": staff_id, "drift": drift}
+        if dry_run:
+            return entry
+
+        correction = {field: values["actual"] - values["stored"] for field, values in drift.items()}
+        # Only counters still holding their snapshot values are corrected; a document created meanwhile fails the upsert
+        guard = snapshot if document is not None else {"updated_at": {"$exists": False}}
+        try:
+            result = await staff_stats_collection.update_one(
+                {"staff_id": staff_id, **guard},
+                {"$inc": correction, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=document is None
+            )
+            applied = result.matched_count + (1 if result.upserted_id is not None else 0)
+        except DuplicateKeyError:
+            applied = 0
+        if not applied:
+            logger.warning(f"Stats counters of {staff_id} changed during the rebuild and were left for the next run")
+        return entry
+
+    @staticmethod
+    async def rebuild(staff_ids: Optional[List[str]] = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Recompute counters from the source collections and report (and fix) any drift.
+
+        Returns one entry per staff member whose stored counters differed,
+        listing each drifted counter as {"stored": ..., "actual": ...}. Works
+        one staff member at a time: snapshot their counters, recompute them,
+        then $inc the difference if the counters still hold the snapshot
+        values; counters a write changed meanwhile are left for the next run.
+        Holds the rebuild lock unless dry_run, and raises JobLockedError if
+        another run holds it.
+        """
+        if staff_ids is None:
+            staff_ids = set()
+            for collection in (attendance_records_collection, schedules_collection, tasks_collection, staff_stats_collection):
+                staff_ids.update(await collection.distinct("staff_id"))
+            staff_ids = sorted(staff_id for staff_id in staff_ids if staff_id is not None)
+            full = True
+        else:
+            full = False
+
+        owner = None
+        if not dry_run:
+            owner = await JobLocks.acquire(REBUILD_LOCK)
+            if owner is None:
+                raise JobLockedError("The staff stats are already being rebuilt")
+        drift_report = []
+        completed = False
+        try:
+            for staff_id in staff_ids:
+                if owner and not await JobLocks.renew(REBUILD_LOCK, owner):
+                    raise JobLockedError("The staff stats rebuild lock expired and was taken over")
+                entry = await StaffStatsService._rebuild_staff(staff_id, dry_run)
+                if entry:
+                    drift_report.append(entry)
+            completed = full
+        finally:
+            if owner:
+                await JobLocks.release(REBUILD_LOCK, owner, completed)
+        return drift_report
+
+    @staticmethod
+    async def ensure_initialized():
+        """Build the counters from existing data unless a full rebuild has completed before"""
+        if await JobLocks.completed(REBUILD_LOCK):
+            return
+        try:
+            drift = await StaffStatsService.rebuild()
+            logger.info(f"Staff stats counters built ({len(drift)} staff member(s) corrected)")
+        except JobLockedError:
+            logger.info("Staff stats counters are being built by another worker")
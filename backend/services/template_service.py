@@ -1,7 +1,95 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+import asyncio
+import os
+import time
 from ..database import templates_collection, form_submissions_collection
-from ..models import Template, TemplateCreate, FormSubmission, FormSubmissionCreate, FormSubmissionUpdate
+from ..ids import new_id
+from ..models import Template, TemplateCreate, FormStatus, FormSubmission, FormSubmissionCreate, FormSubmissionUpdate, Page
+from .repository import Repository
+from .pagination import DEFAULT_PAGE_SIZE
+from .versioning import CollectionVersions, TEMPLATES_VERSION_KEY
+from .form_validation import CompiledTemplate, FormValidationError
+
+template_repository = Repository(templates_collection, Template)
+form_submission_repository = Repository(form_submissions_collection, FormSubmission)
+
+class TemplateRegistry:
+    """Process-local copy of every template, with id and category lookups.
+
+    Templates change rarely (only create and delete), so the whole set is
+    loaded once and served from memory. This worker's writes invalidate it
+    directly; writes made by other workers are picked up by comparing the
+    templates collection version at most every `check_interval` seconds.
+    Each template is compiled into a submission validator as part of the same
+    load, so validators are cached per template id and collection version.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = asyncio.Lock()
+        self._version: Optional[int] = None
+        # Bumped by invalidate(), so a load already in flight knows it may have missed the write
+        self._generation = 0
+        self._checked_at = 0.0
+        self._documents: Dict[str, dict] = {}
+        self._templates: Dict[str, Template] = {}
+        self._by_category: Dict[str, List[Template]] = {}
+        self._validators: Dict[str, CompiledTemplate] = {}
+        self.reloads = 0
+
+    def invalidate(self):
+        self._version = None
+        self._generation += 1
+
+    async def _refresh(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            generation = self._generation
+            version, _ = await CollectionVersions.get(TEMPLATES_VERSION_KEY)
+            if version != self._version:
+                # Read the version first: a write landing during the load bumps it again and triggers another reload
+                documents = await templates_collection.find({}, {"_id": 0}).to_list(None)
+                templates = {document["id"]: Template(**document) for document in documents}
+                by_category: Dict[str, List[Template]] = {}
+                for template in templates.values():
+                    by_category.setdefault(template.category, []).append(template)
+                self._documents = {document["id"]: document for document in documents}
+                self._validators = {template_id: CompiledTemplate(template) for template_id, template in templates.items()}
+                self._templates, self._by_category = templates, by_category
+                # After an invalidate() during the load, leave the version unset so the next read reloads
+                if generation == self._generation:
+                    self._version = version
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+
+    async def all(self) -> List[Template]:
+        await self._refresh()
+        return list(self._templates.values())
+
+    async def by_category(self, category: str) -> List[Template]:
+        await self._refresh()
+        return list(self._by_category.get(category, []))
+
+    async def get(self, template_id: str) -> Optional[Template]:
+        await self._refresh()
+        return self._templates.get(template_id)
+
+    async def get_document(self, template_id: str) -> Optional[dict]:
+        await self._refresh()
+        return self._documents.get(template_id)
+
+    async def validator(self, template_id: str) -> Optional[CompiledTemplate]:
+        await self._refresh()
+        return self._validators.get(template_id)
+
+template_registry = TemplateRegistry(check_interval=float(os.environ.get("TEMPLATE_REGISTRY_CHECK_SECONDS", "5")))
+
+# Newest first; id breaks ties between submissions created in the same millisecond
+STAFF_LISTING_SORT = [("created_at", -1), ("id", -1)]
 
 class TemplateService:
     
@@ -9,87 +97,81 @@ class TemplateService:
     async def create_template(template_data: TemplateCreate) -> Template:
         """Create a new template"""
         template_dict = template_data.dict()
-        template_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        template_dict["id"] = new_id()
         template_dict["created_at"] = datetime.utcnow()
         template_dict["updated_at"] = datetime.utcnow()
         
-        result = await templates_collection.insert_one(template_dict)
-        
-        created_template = await templates_collection.find_one({"_id": result.inserted_id})
-        created_template.pop("_id", None)
-        
-        return Template(**created_template)
+        template = await template_repository.insert(template_dict)
+        await CollectionVersions.bump(TEMPLATES_VERSION_KEY)
+        template_registry.invalidate()
+        return template
     
     @staticmethod
     async def get_template(template_id: str) -> Optional[Template]:
         """Get template by ID"""
-        template = await templates_collection.find_one({"id": template_id})
-        if template:
-            template.pop("_id", None)
-            return Template(**template)
-        return None
+        return await template_registry.get(template_id)
+    
+    @staticmethod
+    async def get_template_document(template_id: str) -> Optional[dict]:
+        """Get the raw template document, for conditional GETs"""
+        return await template_registry.get_document(template_id)
+    
+    @staticmethod
+    async def get_templates_version():
+        """(version, last changed) of the template listings"""
+        return await CollectionVersions.get(TEMPLATES_VERSION_KEY)
     
     @staticmethod
     async def get_all_templates() -> List[Template]:
         """Get all templates"""
-        templates = []
-        cursor = templates_collection.find({})
-        async for template in cursor:
-            template.pop("_id", None)
-            templates.append(Template(**template))
-        return templates
+        return await template_registry.all()
     
     @staticmethod
     async def get_templates_by_category(category: str) -> List[Template]:
         """Get templates by category"""
-        templates = []
-        cursor = templates_collection.find({"category": category})
-        async for template in cursor:
-            template.pop("_id", None)
-            templates.append(Template(**template))
-        return templates
+        return await template_registry.by_category(category)
     
     @staticmethod
     async def delete_template(template_id: str) -> bool:
         """Delete template"""
-        result = await templates_collection.delete_one({"id": template_id})
-        return result.deleted_count > 0
+        deleted = await template_repository.delete(template_id)
+        if deleted:
+            await CollectionVersions.bump(TEMPLATES_VERSION_KEY)
+            template_registry.invalidate()
+        return deleted
 
 class FormSubmissionService:
     
+    @staticmethod
+    async def validate_submission_data(template_id: str, data: dict, submission_status: FormStatus):
+        """Check data against the template's compiled validator. Drafts may leave required fields empty"""
+        validator = await template_registry.validator(template_id)
+        if validator is None:
+            raise FormValidationError([{"field": "template_id", "message": f"template {template_id} not found"}])
+        validator.validate(data, enforce_required=submission_status != FormStatus.draft)
+    
     @staticmethod
     async def create_form_submission(submission_data: FormSubmissionCreate) -> FormSubmission:
         """Create a new form submission"""
+        await FormSubmissionService.validate_submission_data(
+            submission_data.template_id, submission_data.data, submission_data.status
+        )
         submission_dict = submission_data.dict()
-        submission_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        submission_dict["id"] = new_id()
         submission_dict["created_at"] = datetime.utcnow()
         submission_dict["updated_at"] = datetime.utcnow()
         
-        result = await form_submissions_collection.insert_one(submission_dict)
-        
-        created_submission = await form_submissions_collection.find_one({"_id": result.inserted_id})
-        created_submission.pop("_id", None)
-        
-        return FormSubmission(**created_submission)
+        return await form_submission_repository.insert(submission_dict)
     
     @staticmethod
     async def get_form_submission(submission_id: str) -> Optional[FormSubmission]:
         """Get form submission by ID"""
-        submission = await form_submissions_collection.find_one({"id": submission_id})
-        if submission:
-            submission.pop("_id", None)
-            return FormSubmission(**submission)
-        return None
+        return await form_submission_repository.get(submission_id)
     
     @staticmethod
-    async def get_form_submissions_by_staff(staff_id: str) -> List[FormSubmission]:
-        """Get all form submissions for a staff member"""
-        submissions = []
-        cursor = form_submissions_collection.find({"staff_id": staff_id}).sort("created_at", -1)
-        async for submission in cursor:
-            submission.pop("_id", None)
-            submissions.append(FormSubmission(**submission))
-        return submissions
+    async def get_form_submissions_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Page[FormSubmission]:
+        """Get a page of form submissions for a staff member, newest first"""
+        return await form_submission_repository.paginate({"staff_id": staff_id}, STAFF_LISTING_SORT, limit, after)
     
     @staticmethod
     async def update_form_submission(submission_id: str, update_data: FormSubmissionUpdate) -> Optional[FormSubmission]:
@@ -98,6 +180,18 @@ class FormSubmissionService:
         if not update_dict:
             return await FormSubmissionService.get_form_submission(submission_id)
         
+        # Validate the submission as it will be stored: new data or status merged over the current ones
+        current = await form_submissions_collection.find_one(
+            {"id": submission_id}, {"_id": 0, "template_id": 1, "data": 1, "status": 1}
+        )
+        if not current:
+            return None
+        await FormSubmissionService.validate_submission_data(
+            current["template_id"],
+            update_dict.get("data", current.get("data") or {}),
+            FormStatus(update_dict.get("status", current.get("status", FormStatus.draft)))
+        )
+        
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await form_submissions_collection.update_one(
@@ -112,5 +206,4 @@ class FormSubmissionService:
     @staticmethod
     async def delete_form_submission(submission_id: str) -> bool:
         """Delete form submission"""
-        result = await form_submissions_collection.delete_one({"id": submission_id})
-        return result.deleted_count > 0
\ No newline at end of file
+        return await form_submission_repository.delete(submission_id)
\ No newline at end of file
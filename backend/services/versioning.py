@@ -0,0 +1,35 @@
+from typing import Optional, Tuple
+from datetime import datetime
+from ..database import collection_versions_collection
+
+TEMPLATES_VERSION_KEY = "templates"
+
+def schedules_version_key(staff_id: str) -> str:
+    """Version key covering every schedule listing of one staff member"""
+    return f"schedules:{staff_id}"
+
+class CollectionVersions:
+    """Monotonic version counters for listings, bumped by every write that changes them.
+
+    A listing's ETag is its version, so checking whether a client's copy is
+    current costs one indexed lookup instead of re-reading the listing. The
+    counters also tell process-local caches when to reload.
+    """
+
+    @staticmethod
+    async def bump(*keys: str):
+        now = datetime.utcnow()
+        for key in keys:
+            await collection_versions_collection.update_one(
+                {"key": key},
+                {"$inc": {"version": 1}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+
+    @staticmethod
+    async def get(key: str) -> Tuple[int, Optional[datetime]]:
+        """(version, last changed) for a key; (0, None) if it was never bumped"""
+        document = await collection_versions_collection.find_one({"key": key}, {"_id": 0, "version": 1, "updated_at": 1})
+        if not document:
+            return 0, None
+        return document["version"], document.get("updated_at")
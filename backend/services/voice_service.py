@@ -1,7 +1,16 @@
 from typing import List, Optional
 from datetime import datetime
 from ..database import voice_transcriptions_collection, voice_to_template_conversions_collection
-from ..models import VoiceTranscription, VoiceTranscriptionCreate, VoiceToTemplateConversion, VoiceToTemplateConversionCreate
+from ..ids import new_id
+from ..models import VoiceTranscription, VoiceTranscriptionCreate, VoiceToTemplateConversion, VoiceToTemplateConversionCreate, Page
+from .repository import Repository
+from .pagination import DEFAULT_PAGE_SIZE
+
+voice_transcription_repository = Repository(voice_transcriptions_collection, VoiceTranscription)
+voice_conversion_repository = Repository(voice_to_template_conversions_collection, VoiceToTemplateConversion)
+
+# Newest first; id breaks ties between documents created in the same millisecond
+STAFF_LISTING_SORT = [("created_at", -1), ("id", -1)]
 
 class VoiceService:
     
@@ -9,40 +18,25 @@ class VoiceService:
     async def create_voice_transcription(transcription_data: VoiceTranscriptionCreate) -> VoiceTranscription:
         """Create a new voice transcription"""
         transcription_dict = transcription_data.dict()
-        transcription_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        transcription_dict["id"] = new_id()
         transcription_dict["created_at"] = datetime.utcnow()
         
-        result = await voice_transcriptions_collection.insert_one(transcription_dict)
-        
-        created_transcription = await voice_transcriptions_collection.find_one({"_id": result.inserted_id})
-        created_transcription.pop("_id", None)
-        
-        return VoiceTranscription(**created_transcription)
+        return await voice_transcription_repository.insert(transcription_dict)
     
     @staticmethod
     async def get_voice_transcription(transcription_id: str) -> Optional[VoiceTranscription]:
         """Get voice transcription by ID"""
-        transcription = await voice_transcriptions_collection.find_one({"id": transcription_id})
-        if transcription:
-            transcription.pop("_id", None)
-            return VoiceTranscription(**transcription)
-        return None
+        return await voice_transcription_repository.get(transcription_id)
     
     @staticmethod
-    async def get_voice_transcriptions_by_staff(staff_id: str) -> List[VoiceTranscription]:
-        """Get all voice transcriptions for a staff member"""
-        transcriptions = []
-        cursor = voice_transcriptions_collection.find({"staff_id": staff_id}).sort("created_at", -1)
-        async for transcription in cursor:
-            transcription.pop("_id", None)
-            transcriptions.append(VoiceTranscription(**transcription))
-        return transcriptions
+    async def get_voice_transcriptions_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Page[VoiceTranscription]:
+        """Get a page of voice transcriptions for a staff member, newest first"""
+        return await voice_transcription_repository.paginate({"staff_id": staff_id}, STAFF_LISTING_SORT, limit, after)
     
     @staticmethod
     async def delete_voice_transcription(transcription_id: str) -> bool:
         """Delete voice transcription"""
-        result = await voice_transcriptions_collection.delete_one({"id": transcription_id})
-        return result.deleted_count > 0
+        return await voice_transcription_repository.delete(transcription_id)
 
 class VoiceToTemplateService:
     
@@ -50,40 +44,25 @@ class VoiceToTemplateService:
     async def create_voice_to_template_conversion(conversion_data: VoiceToTemplateConversionCreate) -> VoiceToTemplateConversion:
         """Create a new voice to template conversion"""
         conversion_dict = conversion_data.dict()
-        conversion_dict["id"] = str(datetime.now().timestamp()).replace(".", "")
+        conversion_dict["id"] = new_id()
         conversion_dict["created_at"] = datetime.utcnow()
         
-        result = await voice_to_template_conversions_collection.insert_one(conversion_dict)
-        
-        created_conversion = await voice_to_template_conversions_collection.find_one({"_id": result.inserted_id})
-        created_conversion.pop("_id", None)
-        
-        return VoiceToTemplateConversion(**created_conversion)
+        return await voice_conversion_repository.insert(conversion_dict)
     
     @staticmethod
     async def get_voice_to_template_conversion(conversion_id: str) -> Optional[VoiceToTemplateConversion]:
         """Get voice to template conversion by ID"""
-        conversion = await voice_to_template_conversions_collection.find_one({"id": conversion_id})
-        if conversion:
-            conversion.pop("_id", None)
-            return VoiceToTemplateConversion(**conversion)
-        return None
+        return await voice_conversion_repository.get(conversion_id)
     
     @staticmethod
-    async def get_voice_to_template_conversions_by_staff(staff_id: str) -> List[VoiceToTemplateConversion]:
-        """Get all voice to template conversions for a staff member"""
-        conversions = []
-        cursor = voice_to_template_conversions_collection.find({"staff_id": staff_id}).sort("created_at", -1)
-        async for conversion in cursor:
-            conversion.pop("_id", None)
-            conversions.append(VoiceToTemplateConversion(**conversion))
-        return conversions
+    async def get_voice_to_template_conversions_by_staff(staff_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Page[VoiceToTemplateConversion]:
+        """Get a page of voice to template conversions for a staff member, newest first"""
+        return await voice_conversion_repository.paginate({"staff_id": staff_id}, STAFF_LISTING_SORT, limit, after)
     
     @staticmethod
     async def delete_voice_to_template_conversion(conversion_id: str) -> bool:
         """Delete voice to template conversion"""
-        result = await voice_to_template_conversions_collection.delete_one({"id": conversion_id})
-        return result.deleted_count > 0
+        return await voice_conversion_repository.delete(conversion_id)
     
     @staticmethod
     async def process_voice_to_template(transcription: str, staff_id: str) -> dict:
@@ -107,7 +86,7 @@ class VoiceToTemplateService:
                 "grade": VoiceToTemplateService._extract_value(transcription, ['grade 12', 'grade 11', 'grade 10', 'grade 9'], 'Grade 12'),
                 "topic": VoiceToTemplateService._extract_value(transcription, ['derivatives', 'chain rule', 'product rule', 'integration'], 'Derivatives and Chain Rule'),
                 "objectives": 'Students will understand and apply the chain rule and product rule for derivatives, and solve practical application problems.',
-                "duration": VoiceToTemplateService._extract_value(transcription, ['60 minutes', '90 minutes', '45 minutes'], '60'),
+                "duration": VoiceToTemplateService._extract_value(transcription, ['60 minutes', '90 minutes', '45 minutes'], '60 minutes').split()[0],
                 "materials": VoiceToTemplateService._extract_value(transcription, ['graphing calculators', 'textbooks', 'worksheets'], 'Graphing calculators, whiteboard, practice worksheets'),
                 "activities": 'Introduction to chain rule concepts, guided practice problems, group work on real-world applications, individual practice time.',
                 "assessment": 'Formative assessment through practice problems, exit ticket with 3 derivative problems using chain rule.'